@@ -0,0 +1,122 @@
+## Admission control: per-analysis-type concurrency limits with a bounded wait queue
+import os
+import math
+import time
+import asyncio
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from executors import ANALYSIS_TYPES, analysis_workers
+
+# Minimum Retry-After (seconds) sent with a 429
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 5))
+
+
+def admission_limit(analysis_type: str) -> int:
+    """Concurrent analyses per type; defaults to the analysis pool size.
+    Override with ADMISSION_LIMIT_<TYPE>, e.g. ADMISSION_LIMIT_COMPREHENSIVE=2"""
+    return int(os.getenv(f"ADMISSION_LIMIT_{analysis_type.upper()}", analysis_workers(analysis_type)))
+
+
+def admission_queue(analysis_type: str) -> int:
+    """Requests allowed to wait for a slot; override with ADMISSION_QUEUE_<TYPE>"""
+    return int(os.getenv(f"ADMISSION_QUEUE_{analysis_type.upper()}", 2 * admission_limit(analysis_type)))
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue for an analysis type is full"""
+
+    def __init__(self, analysis_type: str, retry_after: int):
+        self.analysis_type = analysis_type
+        self.retry_after = retry_after
+        super().__init__(f"Too many {analysis_type} analyses in progress, retry in {retry_after} seconds")
+
+
+class _Gate:
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_seconds = 0.0
+
+
+class Ticket:
+    """An admitted request; hand it back to AdmissionController.release()"""
+
+    def __init__(self, analysis_type: str):
+        self.analysis_type = analysis_type
+        self.started = time.perf_counter()
+
+
+class AdmissionController:
+    """Admits requests per analysis type; rejects fast once the wait queue is full
+
+    Unknown analysis types share the comprehensive gate, like run_analysis.
+    """
+
+    def __init__(self, limits: dict = None, queues: dict = None):
+        limits = limits or {}
+        queues = queues or {}
+        self._gates = {
+            analysis_type: _Gate(
+                limits.get(analysis_type, admission_limit(analysis_type)),
+                queues.get(analysis_type, admission_queue(analysis_type)),
+            )
+            for analysis_type in ANALYSIS_TYPES
+        }
+
+    def _key(self, analysis_type: str) -> str:
+        return analysis_type if analysis_type in self._gates else "comprehensive"
+
+    def retry_after(self, analysis_type: str) -> int:
+        """Seconds until a slot is likely free, from the average service time"""
+        gate = self._gates[self._key(analysis_type)]
+        estimate = math.ceil(gate.avg_seconds * (gate.waiting + 1) / gate.limit)
+        return max(ADMISSION_RETRY_AFTER, estimate)
+
+    async def acquire(self, analysis_type: str) -> Ticket:
+        """Wait for a slot; raises AdmissionRejected when the wait queue is full"""
+        key = self._key(analysis_type)
+        gate = self._gates[key]
+        if gate.semaphore.locked() and gate.waiting >= gate.queue_size:
+            gate.rejected += 1
+            raise AdmissionRejected(key, self.retry_after(key))
+
+        gate.waiting += 1
+        try:
+            await gate.semaphore.acquire()
+        finally:
+            gate.waiting -= 1
+        gate.active += 1
+        gate.admitted += 1
+        return Ticket(key)
+
+    def release(self, ticket: Ticket):
+        gate = self._gates[ticket.analysis_type]
+        elapsed = time.perf_counter() - ticket.started
+        # Exponential moving average of time a request holds a slot
+        gate.avg_seconds = elapsed if gate.avg_seconds == 0 else 0.8 * gate.avg_seconds + 0.2 * elapsed
+        gate.active -= 1
+        gate.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            analysis_type: {
+                "limit": gate.limit,
+                "queue_size": gate.queue_size,
+                "active": gate.active,
+                "queued": gate.waiting,
+                "admitted": gate.admitted,
+                "rejected": gate.rejected,
+                "avg_seconds": round(gate.avg_seconds, 4),
+            }
+            for analysis_type, gate in self._gates.items()
+        }
+
+
+admission = AdmissionController()
@@ -6,7 +6,7 @@ load_dotenv()
 from crewai import Agent
 from langchain_openai import ChatOpenAI
 
-from tools import search_tool, BloodTestReportTool, NutritionTool, ExerciseTool
+from tools import search_tool, blood_test_tool, verification_tool, NutritionTool, ExerciseTool
 
 ### Loading LLM
 llm = ChatOpenAI(
@@ -28,7 +28,7 @@ doctor = Agent(
         "You emphasize the importance of consulting with healthcare providers for proper medical advice. "
         "You are thorough, professional, and always prioritize patient safety in your recommendations."
     ),
-    tools=[BloodTestReportTool()],
+    tools=[blood_test_tool],
     llm=llm,
     max_iter=3,
     allow_delegation=True
@@ -47,7 +47,7 @@ verifier = Agent(
         "You ensure document authenticity and completeness before analysis proceeds. "
         "You are detail-oriented and maintain high standards for medical document verification."
     ),
-    tools=[BloodTestReportTool()],
+    tools=[verification_tool],
     llm=llm,
     max_iter=2,
     allow_delegation=False
@@ -66,7 +66,7 @@ nutritionist = Agent(
         "You consider individual health conditions, medications, and lifestyle factors in your recommendations. "
         "You always emphasize the importance of working with healthcare providers for comprehensive care."
     ),
-    tools=[BloodTestReportTool(), NutritionTool()],
+    tools=[blood_test_tool, NutritionTool()],
     llm=llm,
     max_iter=3,
     allow_delegation=False
@@ -85,7 +85,7 @@ exercise_specialist = Agent(
         "You prioritize safety and gradual progression in all exercise recommendations. "
         "You work closely with healthcare teams to ensure exercise programs complement medical treatment plans."
     ),
-    tools=[BloodTestReportTool(), ExerciseTool()],
+    tools=[blood_test_tool, ExerciseTool()],
     llm=llm,
     max_iter=3,
     allow_delegation=False
@@ -357,7 +357,7 @@ verifier = Agent(
     verbose=True,
     memory=True,
     backstory="Medical records specialist with expertise in document validation and medical report authentication.",
-    tools=[BloodTestReportTool()],
+    tools=[BloodTestReportTool(report_format="text")],
     llm=llm,
     max_iter=1,
     allow_delegation=False
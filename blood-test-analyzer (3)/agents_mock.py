@@ -267,7 +267,7 @@ verifier = Agent(
         "You ensure document authenticity and completeness before analysis proceeds. "
         "You are detail-oriented and maintain high standards for medical document verification."
     ),
-    tools=[BloodTestReportTool()],
+    tools=[BloodTestReportTool(report_format="text")],
     llm=llm,
     max_iter=2,
     allow_delegation=False
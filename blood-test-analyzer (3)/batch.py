@@ -0,0 +1,155 @@
+## Batch analysis of many reports in one request
+import os
+import json
+import uuid
+import shutil
+import asyncio
+import zipfile
+import tempfile
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from ingest import MAX_UPLOAD_SIZE
+from executors import run_io, run_batch, BATCH_WORKERS
+from pdf_sniff import sniff_pdf
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 500))
+# Bytes one batch may spool to disk: uploads plus inflated zip members
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("BATCH_MAX_TOTAL_BYTES", 256 * 1024 * 1024))
+BATCH_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BatchTooLarge(Exception):
+    """Raised when a batch holds more reports than BATCH_MAX_FILES or more bytes than BATCH_MAX_TOTAL_BYTES"""
+
+    def __init__(self, max_files: int = None, max_bytes: int = None):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        if max_bytes is not None:
+            super().__init__(f"Batch exceeds maximum total size of {max_bytes} bytes")
+        else:
+            super().__init__(f"Batch exceeds maximum of {max_files} reports")
+
+
+class BatchSpool:
+    """A batch's reports spooled to a temporary directory instead of held in memory
+
+    documents lists (name, path, size) for every report to analyze. Every
+    upload and inflated zip member counts against max_bytes before it is
+    written; cleanup() removes the directory and may be called more than once.
+    """
+
+    def __init__(self, max_files: int = BATCH_MAX_FILES, max_bytes: int = BATCH_MAX_TOTAL_BYTES):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.directory = tempfile.mkdtemp(prefix="batch-")
+        self.documents = []
+        self.total_bytes = 0
+
+    def new_path(self, suffix: str = ".pdf") -> str:
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}{suffix}")
+
+    def reserve(self, size: int):
+        """Count size bytes against the batch budget, raising BatchTooLarge when it is exceeded"""
+        if self.total_bytes + size > self.max_bytes:
+            raise BatchTooLarge(max_bytes=self.max_bytes)
+        self.total_bytes += size
+
+    def add(self, name: str, path: str, size: int):
+        if len(self.documents) >= self.max_files:
+            raise BatchTooLarge(self.max_files)
+        self.documents.append((name, path, size))
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def expand_zip(path: str, spool: BatchSpool, max_member_size: int = MAX_UPLOAD_SIZE) -> int:
+    """Inflate every PDF inside a zip archive into the spool; returns the number added
+
+    Members are size-checked from the zip directory, and counted against the
+    batch budget, before they are inflated; zipfile stops reading a member at
+    its declared size.
+    """
+    added = 0
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.infolist():
+            if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                continue
+            if member.file_size > max_member_size:
+                raise ValueError(f"{member.filename} exceeds maximum upload size of {max_member_size} bytes")
+            if len(spool.documents) >= spool.max_files:
+                raise BatchTooLarge(spool.max_files)
+            spool.reserve(member.file_size)
+            member_path = spool.new_path()
+            with archive.open(member) as source, open(member_path, "wb") as target:
+                shutil.copyfileobj(source, target, BATCH_COPY_CHUNK_SIZE)
+            spool.add(member.filename, member_path, member.file_size)
+            added += 1
+    return added
+
+
+async def analyze_documents(documents: list, analyze, analysis_type: str, cleanup=None):
+    """Yield one result per document as soon as its analysis finishes
+
+    documents lists (name, path, size); analyze(path, name, probe), with the
+    report's pre-flight PdfProbe, runs on the batch pool, apart from the
+    per-type pools that admitted /analyze requests use,
+    and at most BATCH_WORKERS reports of one batch are in flight at once.
+    PDF parsing inside it is fanned out across the extraction process pool.
+    Reports are read from disk only when analyzed. cleanup, if given, is a
+    StreamCleanup that tracks every analysis started.
+    """
+    in_flight = asyncio.Semaphore(BATCH_WORKERS)
+
+    async def analyze_one(name: str, path: str, size: int) -> dict:
+        try:
+            async with in_flight:
+                probe = await run_io(sniff_pdf, path)
+                if not probe.ok:
+                    return {"file": name, "status": "error", "detail": f"Invalid PDF: {probe.problem}"}
+                analysis = await run_batch(analyze, path, name, probe)
+            return {
+                "file": name,
+                "status": "success",
+                "analysis_type": analysis_type,
+                "file_size": f"{size} bytes",
+                "analysis": str(analysis)
+            }
+        except Exception as e:
+            return {"file": name, "status": "error", "detail": str(e)}
+
+    tasks = [asyncio.ensure_future(analyze_one(name, path, size)) for name, path, size in documents]
+    if cleanup is not None:
+        for task in tasks:
+            cleanup.track(task)
+    for finished in asyncio.as_completed(tasks):
+        yield await finished
+
+
+async def ndjson_results(documents: list, analyze, analysis_type: str, rejected: list = None, cleanup=None):
+    """Stream batch results as NDJSON lines, ending with a summary line
+
+    cleanup, if given, is a StreamCleanup closed once the stream ends or the
+    client goes away; it runs after every started analysis has finished.
+    """
+    succeeded = 0
+    failed = 0
+
+    try:
+        for result in rejected or []:
+            failed += 1
+            yield json.dumps(result) + "\n"
+
+        async for result in analyze_documents(documents, analyze, analysis_type, cleanup):
+            if result["status"] == "success":
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(result) + "\n"
+
+        yield json.dumps({"status": "done", "processed": succeeded, "failed": failed}) + "\n"
+    finally:
+        if cleanup is not None:
+            cleanup.close()
@@ -0,0 +1,234 @@
+## Columnar, NumPy-backed container for biomarker results
+import threading
+
+import numpy as np
+
+from biomarkers import Biomarker, parse_biomarkers, parse_patient
+from extraction_cache import extraction_cache
+from pdf_extractor import document_digest, extraction_key, extract_pages
+
+FLAG_HIGH = 1
+FLAG_LOW = 2
+FLAG_HAS_RANGE = 4
+
+
+class Vocabulary:
+    """Interns strings to stable integer codes shared by every table in the process"""
+
+    def __init__(self):
+        self._codes = {}
+        self.names = []
+        self._lock = threading.Lock()
+
+    def code(self, name: str) -> int:
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    code = len(self.names)
+                    self.names.append(name)
+                    self._codes[name] = code
+        return code
+
+    def codes(self, names) -> np.ndarray:
+        return np.fromiter((self.code(name) for name in names), dtype=np.int32)
+
+    def lookup(self, name: str) -> int:
+        """Code for name, or -1 when it was never interned"""
+        return self._codes.get(name, -1)
+
+
+ANALYTES = Vocabulary()
+UNITS = Vocabulary()
+PATIENTS = Vocabulary()
+
+_COLUMNS = ("report", "patient", "analyte", "unit", "value", "low", "high", "flags")
+
+
+def _flag_bits(record: Biomarker) -> int:
+    bits = FLAG_HAS_RANGE if record.low is not None or record.high is not None else 0
+    if record.flag == "high":
+        bits |= FLAG_HIGH
+    elif record.flag == "low":
+        bits |= FLAG_LOW
+    return bits
+
+
+class BiomarkerTable:
+    """Biomarker results stored column by column
+
+    Values and bounds are float64 arrays (NaN for a missing bound), analytes,
+    units and patients are int32 codes into the shared vocabularies, and flags
+    is a uint8 bitmap of FLAG_HIGH, FLAG_LOW and FLAG_HAS_RANGE. report holds a
+    per-table report index; tables built by from_records() and concat() keep
+    each report's rows contiguous, so by_report() returns zero-copy views.
+    """
+
+    def __init__(self, report, patient, analyte, unit, value, low, high, flags, report_ids=None):
+        self.report = report
+        self.patient = patient
+        self.analyte = analyte
+        self.unit = unit
+        self.value = value
+        self.low = low
+        self.high = high
+        self.flags = flags
+        # report index -> caller's report id (e.g. the PDF digest)
+        self.report_ids = list(report_ids or [])
+
+    @classmethod
+    def empty(cls) -> "BiomarkerTable":
+        return cls(*cls._empty_columns())
+
+    @staticmethod
+    def _empty_columns() -> list:
+        ints = np.empty(0, dtype=np.int32)
+        floats = np.empty(0, dtype=np.float64)
+        return [ints, ints, ints, ints, floats, floats, floats, np.empty(0, dtype=np.uint8)]
+
+    @classmethod
+    def from_records(cls, records: list, report_id: str = "", patient: str = "") -> "BiomarkerTable":
+        """Build a single-report table from parsed Biomarker records"""
+        count = len(records)
+        nan = float("nan")
+        return cls(
+            report=np.zeros(count, dtype=np.int32),
+            patient=np.full(count, PATIENTS.code(patient), dtype=np.int32),
+            analyte=ANALYTES.codes(record.analyte for record in records),
+            unit=UNITS.codes(record.unit for record in records),
+            value=np.fromiter((record.value for record in records), dtype=np.float64, count=count),
+            low=np.fromiter((nan if record.low is None else record.low for record in records), dtype=np.float64, count=count),
+            high=np.fromiter((nan if record.high is None else record.high for record in records), dtype=np.float64, count=count),
+            flags=np.fromiter((_flag_bits(record) for record in records), dtype=np.uint8, count=count),
+            report_ids=[report_id],
+        )
+
+    @classmethod
+    def concat(cls, tables: list) -> "BiomarkerTable":
+        """Stack tables from many reports with one copy per column"""
+        tables = [table for table in tables if len(table.report_ids)]
+        if not tables:
+            return cls.empty()
+        report_ids = []
+        reports = []
+        for table in tables:
+            reports.append(table.report + len(report_ids))
+            report_ids.extend(table.report_ids)
+        columns = [np.concatenate(reports)]
+        for name in _COLUMNS[1:]:
+            columns.append(np.concatenate([getattr(table, name) for table in tables]))
+        return cls(*columns, report_ids=report_ids)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def __iter__(self):
+        """Yield rows as Biomarker records"""
+        for index in range(len(self)):
+            yield self.record(index)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in _COLUMNS)
+
+    def record(self, index: int) -> Biomarker:
+        bits = int(self.flags[index])
+        low = float(self.low[index])
+        high = float(self.high[index])
+        flag = "high" if bits & FLAG_HIGH else "low" if bits & FLAG_LOW else "normal"
+        return Biomarker(
+            analyte=ANALYTES.names[self.analyte[index]],
+            value=float(self.value[index]),
+            unit=UNITS.names[self.unit[index]],
+            low=None if np.isnan(low) else low,
+            high=None if np.isnan(high) else high,
+            flag=flag,
+        )
+
+    def take(self, rows) -> "BiomarkerTable":
+        """Subset by slice (zero-copy views) or index array / boolean mask (copies)"""
+        columns = [getattr(self, name)[rows] for name in _COLUMNS]
+        return BiomarkerTable(*columns, report_ids=self.report_ids)
+
+    def by_report(self, report_id: str) -> "BiomarkerTable":
+        """Rows of one report as zero-copy views (rows must be in report order)"""
+        index = self.report_ids.index(report_id)
+        start, stop = np.searchsorted(self.report, [index, index + 1])
+        return self.take(slice(int(start), int(stop)))
+
+    def by_analyte(self, analyte: str) -> "BiomarkerTable":
+        return self.take(self.analyte == ANALYTES.lookup(analyte))
+
+    def by_patient(self, patient: str) -> "BiomarkerTable":
+        return self.take(self.patient == PATIENTS.lookup(patient))
+
+    def group_by(self, column: str) -> dict:
+        """Sort once by column and return {name: zero-copy view} per distinct value"""
+        vocabulary = {"analyte": ANALYTES, "unit": UNITS, "patient": PATIENTS}[column]
+        codes = getattr(self, column)
+        order = np.argsort(codes, kind="stable")
+        ordered = self.take(order)
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else []
+        groups = {}
+        for position, start in enumerate(starts):
+            stop = starts[position + 1] if position + 1 < len(starts) else len(codes)
+            groups[vocabulary.names[sorted_codes[start]]] = ordered.take(slice(int(start), int(stop)))
+        return groups
+
+    def abnormal(self) -> "BiomarkerTable":
+        return self.take((self.flags & (FLAG_HIGH | FLAG_LOW)) != 0)
+
+    def to_columns(self) -> dict:
+        """JSON-friendly columns with names instead of process-local codes"""
+        return {
+            "report_ids": self.report_ids,
+            "report": self.report.tolist(),
+            "patient": [PATIENTS.names[code] for code in self.patient],
+            "analyte": [ANALYTES.names[code] for code in self.analyte],
+            "unit": [UNITS.names[code] for code in self.unit],
+            "value": self.value.tolist(),
+            "low": [None if np.isnan(bound) else bound for bound in self.low.tolist()],
+            "high": [None if np.isnan(bound) else bound for bound in self.high.tolist()],
+            "flags": self.flags.tolist(),
+        }
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> "BiomarkerTable":
+        def bounds(values):
+            return np.array([np.nan if bound is None else bound for bound in values], dtype=np.float64)
+
+        return cls(
+            report=np.array(columns["report"], dtype=np.int32),
+            patient=PATIENTS.codes(columns["patient"]),
+            analyte=ANALYTES.codes(columns["analyte"]),
+            unit=UNITS.codes(columns["unit"]),
+            value=np.array(columns["value"], dtype=np.float64),
+            low=bounds(columns["low"]),
+            high=bounds(columns["high"]),
+            flags=np.array(columns["flags"], dtype=np.uint8),
+            report_ids=columns["report_ids"],
+        )
+
+
+def document_biomarkers(source, pages: list = None, digest: str = None) -> BiomarkerTable:
+    """Biomarker table for a PDF, cached alongside its extracted pages
+
+    Pass pages when they have already been extracted for this request, and
+    digest when the PDF's SHA-256 is known; the PDF is hashed at most once.
+    """
+    digest = digest or document_digest(source)
+    key = extraction_key(source, digest)
+    entry = extraction_cache.get(key)
+    if entry is not None and "biomarker_table" in entry:
+        return BiomarkerTable.from_columns(entry["biomarker_table"])
+    if pages is None:
+        pages = extract_pages(source, key=key)
+        entry = extraction_cache.get(key)
+
+    text = "\n".join(pages)
+    table = BiomarkerTable.from_records(parse_biomarkers(text), report_id=digest, patient=parse_patient(text))
+    if entry is not None:
+        extraction_cache.put(key, {**entry, "biomarker_table": table.to_columns()})
+    return table
@@ -0,0 +1,170 @@
+## Structured biomarker records parsed from report text
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# "text" sends agents the full report text; "table" sends the report header plus the parsed biomarker table
+REPORT_TOOL_FORMAT = os.getenv("REPORT_TOOL_FORMAT", "text").lower()
+# Most header lines kept above the table in "table" format
+REPORT_HEADER_LINES = int(os.getenv("REPORT_HEADER_LINES", 30))
+
+_NUMBER = r"\d+(?:\.\d+)?"
+# Patient, specimen and report details share the "Label: value" shape but are not analytes
+_NOT_ANALYTE = (
+    r"(?!(?i:age|sex|gender|dob|d\.o\.b|date|birth|born|patient|name|id|mrn|uhid|phone|tel|mobile|fax"
+    r"|page|sample|specimen|collect\w*|receiv\w*|report\w*|regist\w*|accession|lab|laboratory|ref\.?|referr\w*"
+    r"|doctor|physician|dr\.?|room|bed|ward|height|weight)\b)"
+)
+_ANALYTE = rf"(?P<analyte>{_NOT_ANALYTE}[A-Za-z][A-Za-z0-9 ,'/()\-]*?[A-Za-z0-9)])"
+_VALUE = rf"[<>]?\s*(?P<value>{_NUMBER})"
+# Ages and durations ("39 years") are never biomarker units
+_UNIT = r"(?P<unit>%|(?!(?i:years?|yrs?|months?|weeks?|days?|hours?|hrs?)\b)[A-Za-zµμ][A-Za-z0-9µμ/^.*]*)?"
+
+# "Glucose: 92 mg/dL (Normal: 70-100) - Normal"
+_LABELLED_LINE = re.compile(
+    rf"^\s*{_ANALYTE}\s*:\s*{_VALUE}\s*{_UNIT}"
+    r"\s*(?:\((?:(?:normal|reference|ref(?:erence)? range|range)\s*:?)?\s*(?P<range>[^)]*)\))?"
+    r"\s*(?:[-–—]\s*(?P<status>.*?))?\s*$",
+    re.IGNORECASE,
+)
+# Table rows: "Glucose    92   mg/dL   70-100   H"
+_TABLE_ROW = re.compile(
+    rf"^\s*{_ANALYTE}\s+{_VALUE}\s*{_UNIT}"
+    rf"\s+(?P<range>[<>]\s*{_NUMBER}|{_NUMBER}\s*[-–]\s*{_NUMBER})\s*\S*"
+    r"(?:\s+(?P<status>[A-Za-z*]+))?\s*$"
+)
+# Rows of format_table() output, so tools can re-read the table agents pass along
+_PIPE_ROW = re.compile(
+    rf"^\s*{_ANALYTE}\s*\|\s*{_VALUE}\s*\|\s*{_UNIT}\s*\|\s*(?P<range>[^|]*?)\s*\|\s*(?P<status>[A-Za-z]*)\s*$"
+)
+_PATIENT = re.compile(r"^\s*Patient(?:\s+name)?\s*:\s*(?P<name>.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+_RANGE = re.compile(
+    rf"(?P<low>{_NUMBER})\s*[-–]\s*(?P<high>{_NUMBER})"
+    rf"|(?P<op>[<>]=?|≤|≥)\s*(?P<bound>{_NUMBER})"
+)
+
+
+@dataclass(frozen=True)
+class Biomarker:
+    """One measured analyte with its reference range and derived flag"""
+    analyte: str
+    value: float
+    unit: str
+    low: Optional[float]
+    high: Optional[float]
+    flag: str
+
+    @property
+    def abnormal(self) -> bool:
+        return self.flag in ("high", "low")
+
+    def reference_range(self) -> str:
+        if self.low is not None and self.high is not None:
+            return f"{self.low:g}-{self.high:g}"
+        if self.high is not None:
+            return f"<{self.high:g}"
+        if self.low is not None:
+            return f">{self.low:g}"
+        return ""
+
+
+def _parse_range(text: str) -> tuple:
+    match = _RANGE.search(text or "")
+    if match is None:
+        return None, None
+    if match.group("low") is not None:
+        return float(match.group("low")), float(match.group("high"))
+    bound = float(match.group("bound"))
+    if match.group("op") in ("<", "<=", "≤"):
+        return None, bound
+    return bound, None
+
+
+def _flag(value: float, low: Optional[float], high: Optional[float], status: str) -> str:
+    if low is not None and value < low:
+        return "low"
+    if high is not None and value > high:
+        return "high"
+    if low is not None or high is not None:
+        return "normal"
+    status = (status or "").lower()
+    if "high" in status or status in ("h", "h*"):
+        return "high"
+    if "low" in status or status in ("l", "l*"):
+        return "low"
+    return "normal"
+
+
+def parse_biomarkers(text: str) -> list:
+    """Parse "Name: value unit (Normal: range) - Status" lines and table rows into records"""
+    records = []
+    for line in text.splitlines():
+        match = _LABELLED_LINE.match(line) or _PIPE_ROW.match(line) or _TABLE_ROW.match(line)
+        if match is None:
+            continue
+        value = float(match.group("value"))
+        low, high = _parse_range(match.group("range"))
+        records.append(Biomarker(
+            analyte=" ".join(match.group("analyte").split()),
+            value=value,
+            unit=match.group("unit") or "",
+            low=low,
+            high=high,
+            flag=_flag(value, low, high, match.group("status")),
+        ))
+    return records
+
+
+def parse_header(text: str, limit: int = REPORT_HEADER_LINES) -> list:
+    """Non-empty lines before the first biomarker row: lab, patient, dates and report title"""
+    header = []
+    for line in text.splitlines():
+        if _LABELLED_LINE.match(line) or _PIPE_ROW.match(line) or _TABLE_ROW.match(line):
+            break
+        line = line.strip()
+        if line:
+            header.append(line)
+            if len(header) >= limit:
+                break
+    return header
+
+
+def parse_patient(text: str) -> str:
+    """Patient name from a "Patient: ..." line, or "" when the report has none"""
+    match = _PATIENT.search(text)
+    return match.group("name") if match else ""
+
+
+def format_table(records, header: list = None) -> str:
+    """Compact pipe-separated table for LLM prompts, below the report's header lines when given"""
+    lines = list(header or [])
+    if lines:
+        lines.append("")
+    lines.append("Analyte | Value | Unit | Range | Flag")
+    for record in records:
+        lines.append(f"{record.analyte} | {record.value:g} | {record.unit} | {record.reference_range()} | {record.flag}")
+    return "\n".join(lines)
+
+
+def flagged_findings(records) -> list:
+    """One line per out-of-range value, e.g. "Ferritin 12 ng/mL is below range (15-150)" """
+    findings = []
+    for record in records:
+        if record.abnormal:
+            direction = "above" if record.flag == "high" else "below"
+            findings.append(
+                f"{record.analyte} {record.value:g} {record.unit} is {direction} range ({record.reference_range()})"
+            )
+    return findings
+
+
+def flagged_summary(text: str) -> str:
+    """Section listing out-of-range values found in text, or "" when there are none"""
+    findings = flagged_findings(parse_biomarkers(text))
+    if not findings:
+        return ""
+    return "\n\nValues outside reference range:\n" + "\n".join(f"• {finding}" for finding in findings)
@@ -0,0 +1,98 @@
+## Dependency-aware crew execution
+import os
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from crewai import Crew, Process
+
+from executors import task_pool
+
+# "parallel" runs independent tasks concurrently, "sequential" keeps Process.sequential crews
+CREW_EXECUTION = os.getenv("CREW_EXECUTION", "parallel").lower()
+PARALLEL_TASKS = CREW_EXECUTION == "parallel"
+
+
+def _dependencies(task) -> list:
+    """Tasks listed in a task's context are the ones it has to wait for"""
+    return task.context if isinstance(task.context, list) else []
+
+
+def copy_tasks(tasks: list, agents: dict = None) -> list:
+    """Copy tasks for a single run so concurrent runs never share task output
+
+    Context references are remapped onto the copies; dependencies outside
+    this run are dropped. agents optionally maps an agent role to the agent
+    that should perform tasks with that role.
+    """
+    agents = agents or {}
+    copies = {}
+    for task in tasks:
+        context = [copies[id(dep)] for dep in _dependencies(task) if id(dep) in copies]
+        update = {"context": context or None}
+        if task.agent is not None and task.agent.role in agents:
+            update["agent"] = agents[task.agent.role]
+        copies[id(task)] = task.model_copy(update=update)
+    return [copies[id(task)] for task in tasks]
+
+
+def build_crew(tasks: list) -> Crew:
+    agents = {}
+    for task in tasks:
+        if task.agent is not None:
+            agents.setdefault(id(task.agent), task.agent)
+    return Crew(
+        agents=list(agents.values()),
+        tasks=tasks,
+        process=Process.sequential,
+        verbose=False
+    )
+
+
+def _kickoff(crew, inputs: dict) -> str:
+    return str(crew.kickoff(inputs))
+
+
+def run_task_graph(tasks: list, inputs: dict, crews: dict = None, progress=None, on_output=None) -> str:
+    """Run tasks as a DAG: each one starts as soon as the tasks in its context finish
+
+    crews maps id(task) to a ready single-task crew (see crew_pool); when
+    omitted, tasks are copied and crews built for this run. progress, if
+    given, is called as progress(task_name, status) when a task starts and
+    completes, and on_output(task_name, output) as soon as a task's output
+    is ready. Returns the output of the last task in the original order,
+    which is what a sequential crew's kickoff returns; callers wanting
+    every task's output collect them through on_output.
+    """
+    if crews is None:
+        run_tasks = copy_tasks(tasks)
+        crews = {id(task): build_crew([task]) for task in run_tasks}
+    else:
+        run_tasks = tasks
+    pending = {id(task): task for task in run_tasks}
+    names = {id(task): task.name for task in run_tasks}
+    running = {}
+    outputs = {}
+
+    while pending or running:
+        for key, task in list(pending.items()):
+            if all(id(dep) in outputs for dep in _dependencies(task)):
+                running[task_pool.submit(_kickoff, crews[key], inputs)] = key
+                del pending[key]
+                if progress:
+                    progress(task.name, "running")
+
+        if not running:
+            raise ValueError("Task graph has unresolved dependencies")
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            key = running.pop(future)
+            outputs[key] = future.result()
+            if on_output:
+                on_output(names[key], outputs[key])
+            if progress:
+                progress(names[key], "completed")
+
+    return outputs[id(run_tasks[-1])]
@@ -0,0 +1,128 @@
+## Pool of pre-built crews per analysis type
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from crew_dag import PARALLEL_TASKS, copy_tasks, build_crew, run_task_graph
+from executors import analysis_workers
+
+# Ready crews kept per analysis type; bounds concurrent crew runs per type. Unset, each
+# type gets one crew per analysis thread, so every request admission lets in has a crew
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE")) if os.getenv("CREW_POOL_SIZE") else None
+# Seconds a request waits for a free crew before failing; 0 waits forever
+CREW_POOL_TIMEOUT = float(os.getenv("CREW_POOL_TIMEOUT", 0))
+
+
+class CrewSet:
+    """Crews for one analysis type with their own task and agent copies
+
+    In parallel mode each task gets a single-task crew for run_task_graph,
+    otherwise all tasks share one sequential crew.
+    """
+
+    def __init__(self, tasks: list, agents: dict = None, parallel: bool = PARALLEL_TASKS):
+        agents = agents or {}
+        agent_copies = {}
+        for task in tasks:
+            agent = agents.get(task.agent.role, task.agent) if task.agent is not None else None
+            if agent is not None and agent.role not in agent_copies:
+                agent_copies[agent.role] = agent.copy()
+
+        self.parallel = parallel
+        self.tasks = copy_tasks(tasks, agents=agent_copies)
+        if parallel:
+            self.crews = {id(task): build_crew([task]) for task in self.tasks}
+        else:
+            self.crew = build_crew(self.tasks)
+
+    def run(self, inputs: dict, progress=None, on_output=None) -> str:
+        """Kick off the crews; progress(task_name, status) reports task completion
+        and on_output(task_name, output) receives each task's output when ready"""
+        if self.parallel:
+            return run_task_graph(self.tasks, inputs, crews=self.crews, progress=progress,
+                                  on_output=on_output)
+
+        def task_finished(output):
+            if on_output:
+                on_output(output.name, str(output))
+            if progress:
+                progress(output.name, "completed")
+
+        if progress or on_output:
+            self.crew.task_callback = task_finished
+        try:
+            return str(self.crew.kickoff(inputs))
+        finally:
+            self.crew.task_callback = None
+
+    def reset(self):
+        """Clear per-run task state before the set goes back to the pool"""
+        for task in self.tasks:
+            task.output = None
+
+
+class CrewPool:
+    """Bounded pool of ready CrewSets, built once at startup
+
+    size defaults to the analysis thread pool size of each type, which is
+    also its admission limit, so admitted requests never queue for a crew.
+    checkout() hands a CrewSet to exactly one request at a time, so
+    concurrent requests never share task output.
+    """
+
+    def __init__(self, analysis_tasks: dict, agents: list = None, size: int = CREW_POOL_SIZE,
+                 timeout: float = CREW_POOL_TIMEOUT):
+        agents_by_role = {agent.role: agent for agent in (agents or [])}
+        self.timeout = timeout or None
+        self._queues = {}
+        for analysis_type, tasks in analysis_tasks.items():
+            type_size = size or analysis_workers(analysis_type)
+            pool = queue.Queue(maxsize=type_size)
+            for _ in range(type_size):
+                pool.put(CrewSet(tasks, agents=agents_by_role))
+            self._queues[analysis_type] = pool
+
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def checkout(self, analysis_type: str):
+        pool = self._queues.get(analysis_type, self._queues["comprehensive"])
+        started = time.perf_counter()
+        try:
+            crews = pool.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"No {analysis_type} crew available after {self.timeout} seconds")
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            yield crews
+        finally:
+            crews.reset()
+            pool.put(crews)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": round(self._wait_total, 4),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 4) if self._checkouts else 0.0,
+                "wait_seconds_max": round(self._wait_max, 4),
+                "available": {analysis_type: pool.qsize() for analysis_type, pool in self._queues.items()},
+            }
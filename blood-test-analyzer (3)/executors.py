@@ -0,0 +1,98 @@
+## Bounded executors that keep blocking work off the asyncio event loop
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from extraction_sandbox import ExtractionSandbox
+
+ANALYSIS_TYPES = ("comprehensive", "nutrition", "exercise", "verification")
+
+# Thread pool size per analysis type (LLM calls and report generation).
+# Override with ANALYSIS_WORKERS_<TYPE>, e.g. ANALYSIS_WORKERS_COMPREHENSIVE=2
+DEFAULT_ANALYSIS_WORKERS = {
+    "comprehensive": 4,
+    "nutrition": 4,
+    "exercise": 4,
+    "verification": 8,
+}
+
+# Thread pool for file I/O (upload writes, cleanup)
+IO_WORKERS = int(os.getenv("IO_WORKERS", 8))
+# Thread pool for crew tasks that run concurrently within one analysis
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", 8))
+# Thread pool for batch reports, kept apart from the per-type pools admission sizes its limits from
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 2))
+# Sandboxed process pool for pypdf parsing; 0 parses in the calling thread
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def analysis_workers(analysis_type: str) -> int:
+    default = DEFAULT_ANALYSIS_WORKERS.get(analysis_type, 4)
+    return int(os.getenv(f"ANALYSIS_WORKERS_{analysis_type.upper()}", default))
+
+
+_analysis_pools = {
+    analysis_type: ThreadPoolExecutor(
+        max_workers=analysis_workers(analysis_type),
+        thread_name_prefix=f"analysis-{analysis_type}",
+    )
+    for analysis_type in ANALYSIS_TYPES
+}
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+task_pool = ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix="crew-task")
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="analysis-batch")
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_pdf_process_pool():
+    """Sandboxed process pool for PDF parsing, created on first use (None when disabled)"""
+    global _process_pool
+    if PDF_PROCESS_WORKERS <= 0:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ExtractionSandbox(PDF_PROCESS_WORKERS)
+        return _process_pool
+
+
+def extraction_sandbox_stats() -> dict:
+    """Budget rejections and worker recycling for /metrics"""
+    if _process_pool is None:
+        return {"workers": PDF_PROCESS_WORKERS, "started": False}
+    return {"workers": PDF_PROCESS_WORKERS, "started": True, **_process_pool.stats()}
+
+
+async def run_io(func, *args, **kwargs):
+    """Run blocking file I/O on the I/O thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_pool, functools.partial(func, *args, **kwargs))
+
+
+async def run_analysis(analysis_type: str, func, *args, **kwargs):
+    """Run a blocking analysis (crew kickoff, MedicalAnalyzer) on the pool for its type"""
+    pool = _analysis_pools.get(analysis_type, _analysis_pools["comprehensive"])
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+
+async def run_batch(func, *args, **kwargs):
+    """Run one batch report's analysis on the batch pool, never on the interactive per-type pools"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(batch_pool, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors():
+    for pool in _analysis_pools.values():
+        pool.shutdown(wait=False)
+    io_pool.shutdown(wait=False)
+    task_pool.shutdown(wait=False)
+    batch_pool.shutdown(wait=False)
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False)
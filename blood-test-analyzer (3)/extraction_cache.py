@@ -0,0 +1,127 @@
+## Content-addressed cache of extracted report data
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Memory tier budget in bytes of extracted text; 0 disables the memory tier
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Optional SQLite file for a persistent tier that survives restarts
+EXTRACTION_CACHE_DB = os.getenv("EXTRACTION_CACHE_DB", "")
+
+
+def _entry_size(entry: dict) -> int:
+    """Approximate memory footprint of a cache entry"""
+    return sum(len(text) for text in entry.get("pages", [])) + 256
+
+
+class ExtractionCache:
+    """LRU cache of extraction results keyed by the SHA-256 of the PDF bytes
+
+    The memory tier evicts least recently used entries once max_bytes is
+    exceeded. When db_path is set, entries are also written to SQLite as
+    zlib-compressed JSON and promoted back into memory on a hit.
+    """
+
+    def __init__(self, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES, db_path: str = EXTRACTION_CACHE_DB):
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extractions (sha256 TEXT PRIMARY KEY, data BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, digest: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT data FROM extractions WHERE sha256 = ?", (digest,)
+                ).fetchone()
+                if row is not None:
+                    entry = json.loads(zlib.decompress(row[0]))
+                    self._remember(digest, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry
+
+            self.misses += 1
+            return None
+
+    def put(self, digest: str, entry: dict):
+        with self._lock:
+            self._remember(digest, entry)
+            if self._db is not None:
+                blob = zlib.compress(json.dumps(entry).encode("utf-8"))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO extractions (sha256, data) VALUES (?, ?)", (digest, blob)
+                )
+                self._db.commit()
+
+    def _remember(self, digest: str, entry: dict):
+        """Insert into the memory tier and evict down to the byte budget (lock held)"""
+        size = _entry_size(entry)
+        if size > self.max_bytes:
+            return
+        if digest in self._entries:
+            self._bytes -= self._sizes[digest]
+        self._entries[digest] = entry
+        self._entries.move_to_end(digest)
+        self._sizes[digest] = size
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            old_digest, _ = self._entries.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_digest)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._db is not None,
+            }
+
+
+# Shared cache used by MedicalAnalyzer and the report tools
+extraction_cache = ExtractionCache()
@@ -0,0 +1,126 @@
+## Per-request extraction context shared by every agent and task in one crew run
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from pdf_extractor import extract_pages, is_memory_ref, document_exists
+from biomarker_table import BiomarkerTable, document_biomarkers
+from report_store import report_store, is_store_ref, STORE_PREFIX
+
+_contexts = {}
+_lock = threading.Lock()
+_stats = {"requests": 0, "parses": 0, "shared_reads": 0, "requests_parsed_more_than_once": 0}
+
+
+def _load_pages(path: str) -> list:
+    """Stored reports are reopened from the report store; anything else is extracted"""
+    if is_store_ref(path):
+        return report_store.resolve(path).pages
+    pages = extract_pages(path)
+    # Keep a parsed copy so later re-analysis skips the PDF entirely
+    report_store.persist(path, pages)
+    return pages
+
+
+def _load_biomarkers(path: str, pages: list = None):
+    if is_store_ref(path):
+        return report_store.resolve(path).biomarkers()
+    return document_biomarkers(path, pages)
+
+
+def context_key(path: str) -> tuple:
+    """Files are keyed by absolute path plus mtime; memory and store refs by the ref itself"""
+    if is_memory_ref(path) or is_store_ref(path):
+        return (path, 0)
+    return (os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+class ExtractionContext:
+    """Extracted pages and derived values for one report during one request
+
+    The first call parses the report; later calls from any agent or task,
+    including ones running concurrently, reuse the result.
+    """
+
+    def __init__(self, path: str, key: tuple):
+        self.path = path
+        self.key = key
+        self.parses = 0
+        self.shared_reads = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def value(self, name: str, compute):
+        """Return the value stored under name, computing it on first use"""
+        with self._lock:
+            if name in self._values:
+                self.shared_reads += 1
+                return self._values[name]
+            result = compute()
+            self._values[name] = result
+            return result
+
+    def pages(self) -> list:
+        def parse():
+            self.parses += 1
+            return _load_pages(self.path)
+        return self.value("pages", parse)
+
+
+@contextmanager
+def extraction_context(path: str):
+    """Open the extraction context for one request and release it when the request ends"""
+    context = ExtractionContext(path, context_key(path))
+    with _lock:
+        _contexts[context.key] = context
+    try:
+        yield context
+    finally:
+        with _lock:
+            if _contexts.get(context.key) is context:
+                del _contexts[context.key]
+            _stats["requests"] += 1
+            _stats["parses"] += context.parses
+            _stats["shared_reads"] += context.shared_reads
+            if context.parses > 1:
+                _stats["requests_parsed_more_than_once"] += 1
+
+
+def current_context(path: str) -> Optional[ExtractionContext]:
+    try:
+        key = context_key(path)
+    except OSError:
+        return None
+    with _lock:
+        return _contexts.get(key)
+
+
+def report_exists(path: str) -> bool:
+    """True for an existing file, a live memory ref or a report in the report store"""
+    if is_store_ref(path):
+        return report_store.contains(path[len(STORE_PREFIX):])
+    return document_exists(path)
+
+
+def report_pages(path: str) -> list:
+    """Page texts for a tool call: shared within the active request, extracted directly otherwise"""
+    context = current_context(path)
+    if context is None:
+        return _load_pages(path)
+    return context.pages()
+
+
+def report_biomarkers(path: str) -> BiomarkerTable:
+    """BiomarkerTable for a tool call, parsed once per request like report_pages"""
+    context = current_context(path)
+    if context is None:
+        return _load_biomarkers(path)
+    pages = context.pages()
+    return context.value("biomarkers", lambda: _load_biomarkers(path, pages))
+
+
+def extraction_context_stats() -> dict:
+    """Totals across finished requests; parses should equal requests"""
+    with _lock:
+        return {**_stats, "active_requests": len(_contexts)}
@@ -0,0 +1,191 @@
+## Supervised subprocess pool for PDF extraction with per-document budgets
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Wall-clock seconds one extraction may take before its worker is killed
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", 30))
+# Documents with more pages are rejected before any page is parsed
+EXTRACTION_MAX_PAGES = int(os.getenv("EXTRACTION_MAX_PAGES", 500))
+# Resident memory a worker may reach while extracting; 0 disables the check
+EXTRACTION_MAX_RSS_MB = int(os.getenv("EXTRACTION_MAX_RSS_MB", 512))
+# Workers are replaced after this many documents to cap heap fragmentation
+EXTRACTION_WORKER_MAX_DOCUMENTS = int(os.getenv("EXTRACTION_WORKER_MAX_DOCUMENTS", 100))
+
+_RSS_POLL_INTERVAL = 0.05
+
+
+class ExtractionRejected(Exception):
+    """Raised when a document breaks an extraction budget or crashes its worker"""
+
+
+def _rss_bytes(pid: int) -> int:
+    """Current resident set size of a process, 0 where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _worker_main(conn):
+    """Worker loop: run (func, args) requests until told to stop"""
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        func, args = request
+        try:
+            conn.send(("ok", func(*args)))
+        except ExtractionRejected as e:
+            conn.send(("rejected", str(e)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {str(e)}"))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.documents = 0
+        # Deadline of the last document served: calls sharing it are one document
+        self._document = None
+
+    def run(self, func, args, deadline: float, timeout: float, max_rss: int):
+        """Run one call until the monotonic deadline; timeout is the budget reported on a breach"""
+        if deadline != self._document:
+            self._document = deadline
+            self.documents += 1
+        self.conn.send((func, args))
+        while not self.conn.poll(_RSS_POLL_INTERVAL):
+            if not self.process.is_alive():
+                self.kill()
+                raise ExtractionRejected("extraction worker crashed on this document")
+            if time.monotonic() > deadline:
+                self.kill()
+                raise ExtractionRejected(f"extraction took longer than {timeout:g} seconds")
+            if max_rss and _rss_bytes(self.process.pid) > max_rss:
+                self.kill()
+                raise ExtractionRejected(f"extraction used more than {max_rss // (1024 * 1024)} MB of memory")
+
+        try:
+            status, value = self.conn.recv()
+        except EOFError:
+            self.kill()
+            raise ExtractionRejected("extraction worker crashed on this document")
+        if status == "rejected":
+            raise ExtractionRejected(value)
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class ExtractionSandbox:
+    """Pool of supervised extraction processes
+
+    Each call runs in a worker process that is killed when it exceeds the
+    wall-clock or RSS budget; a fresh worker takes its place. A document is
+    identified by its deadline: every call for it (page count, page ranges)
+    passes the same one, so it is counted once, and workers are recycled
+    after max_documents documents rather than calls. submit() mirrors the
+    executor API so callers can fan out page ranges under one shared deadline.
+    """
+
+    def __init__(self, workers: int, timeout: float = EXTRACTION_TIMEOUT,
+                 max_rss_mb: int = EXTRACTION_MAX_RSS_MB,
+                 max_documents: int = EXTRACTION_WORKER_MAX_DOCUMENTS):
+        self.timeout = timeout
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_documents = max_documents
+        # spawn avoids forking a process that already runs worker threads
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._dispatch = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extraction")
+        self._stats = {"documents": 0, "rejected": 0, "killed": 0, "recycled": 0}
+
+    def deadline(self) -> float:
+        """Monotonic time by which one document's extraction must finish; call once per document"""
+        with self._lock:
+            self._stats["documents"] += 1
+        return time.monotonic() + self.timeout
+
+    def run(self, func, *args, deadline: float = None):
+        """Run func(*args) in a worker process; raises ExtractionRejected on a budget breach
+
+        Calls made for the same document pass the same deadline, so fanning a
+        document out across workers does not multiply its wall-clock budget.
+        """
+        if deadline is None:
+            deadline = self.deadline()
+        with self._slots:
+            if time.monotonic() > deadline:
+                with self._lock:
+                    self._stats["rejected"] += 1
+                raise ExtractionRejected(f"extraction took longer than {self.timeout:g} seconds")
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+            if worker is None or not worker.alive:
+                worker = _Worker(self._context)
+
+            try:
+                return worker.run(func, args, deadline, self.timeout, self.max_rss)
+            except ExtractionRejected:
+                with self._lock:
+                    self._stats["rejected"] += 1
+                    if not worker.alive:
+                        self._stats["killed"] += 1
+                raise
+            finally:
+                with self._lock:
+                    if worker.alive and worker.documents < self.max_documents:
+                        self._idle.append(worker)
+                        worker = None
+                    elif worker.alive:
+                        self._stats["recycled"] += 1
+                if worker is not None:
+                    worker.stop()
+
+    def submit(self, func, *args, deadline: float = None):
+        return self._dispatch.submit(self.run, func, *args, deadline=deadline)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "idle_workers": len(self._idle)}
+
+    def shutdown(self, wait: bool = True):
+        self._dispatch.shutdown(wait=wait)
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
@@ -0,0 +1,200 @@
+## Pluggable PDF text extraction backends
+import io
+import os
+import json
+import importlib.util
+from functools import lru_cache
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Backend name, or "auto" for the one recorded by scripts/benchmark_backends.py
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "auto").lower()
+EXTRACTOR_BENCH_FILE = os.getenv("EXTRACTOR_BENCH_FILE", "extractor_bench.json")
+DEFAULT_BACKEND = "pypdf"
+# "auto" only leaves the default for a backend this many times faster, measured over at least this many PDFs
+EXTRACTOR_MIN_SPEEDUP = float(os.getenv("EXTRACTOR_MIN_SPEEDUP", 1.25))
+EXTRACTOR_MIN_CORPUS = int(os.getenv("EXTRACTOR_MIN_CORPUS", 10))
+
+
+class ExtractorBackend:
+    """One way of turning a PDF (path or bytes) into page texts
+
+    Subclasses set name and the module they need, and implement open(), which
+    returns a document with a page_count attribute and a page_text(index) method.
+    """
+    name = ""
+    module = ""
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def open(self, payload):
+        raise NotImplementedError
+
+
+_backends = {}
+
+
+def register_backend(backend: ExtractorBackend) -> ExtractorBackend:
+    _backends[backend.name] = backend
+    return backend
+
+
+def _stream(payload):
+    return io.BytesIO(payload) if isinstance(payload, bytes) else payload
+
+
+class _PypdfDocument:
+    def __init__(self, payload, mode: str):
+        from pypdf import PdfReader
+        self._reader = PdfReader(_stream(payload))
+        # Owner-password-only documents open with the empty user password
+        if self._reader.is_encrypted and not self._reader.decrypt(""):
+            raise ValueError("encrypted PDF requires a password")
+        self._mode = mode
+        self.page_count = len(self._reader.pages)
+
+    def page_text(self, index: int) -> str:
+        return self._reader.pages[index].extract_text(extraction_mode=self._mode) or ""
+
+
+class PypdfBackend(ExtractorBackend):
+    """pypdf's default text extraction (also what langchain's PyPDFLoader uses)"""
+    name = "pypdf"
+    module = "pypdf"
+
+    def open(self, payload):
+        return _PypdfDocument(payload, "plain")
+
+
+class PypdfLayoutBackend(ExtractorBackend):
+    """pypdf layout mode: keeps column alignment, slower"""
+    name = "pypdf-layout"
+    module = "pypdf"
+
+    def open(self, payload):
+        return _PypdfDocument(payload, "layout")
+
+
+class _PdfminerDocument:
+    """Parsed once; page_text() lays out only the requested page"""
+
+    def __init__(self, payload):
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfinterp import PDFResourceManager
+        if not isinstance(payload, bytes):
+            with open(payload, "rb") as f:
+                payload = f.read()
+        # Page objects are resolved lazily from the stream, so it stays open with the document
+        self._document = PDFDocument(PDFParser(io.BytesIO(payload)))
+        self._pages = list(PDFPage.create_pages(self._document))
+        self._resources = PDFResourceManager(caching=True)
+        self.page_count = len(self._pages)
+
+    def page_text(self, index: int) -> str:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter
+        output = io.StringIO()
+        device = TextConverter(self._resources, output, laparams=LAParams())
+        try:
+            PDFPageInterpreter(self._resources, device).process_page(self._pages[index])
+        finally:
+            device.close()
+        return output.getvalue()
+
+
+class PdfminerBackend(ExtractorBackend):
+    name = "pdfminer"
+    module = "pdfminer"
+
+    def open(self, payload):
+        return _PdfminerDocument(payload)
+
+
+class _PymupdfDocument:
+    def __init__(self, payload):
+        import fitz
+        if isinstance(payload, bytes):
+            self._document = fitz.open(stream=payload, filetype="pdf")
+        else:
+            self._document = fitz.open(payload)
+        if self._document.needs_pass and not self._document.authenticate(""):
+            raise ValueError("encrypted PDF requires a password")
+        self.page_count = self._document.page_count
+
+    def page_text(self, index: int) -> str:
+        return self._document[index].get_text()
+
+
+class PymupdfBackend(ExtractorBackend):
+    name = "pymupdf"
+    module = "fitz"
+
+    def open(self, payload):
+        return _PymupdfDocument(payload)
+
+
+for _backend in (PypdfBackend(), PypdfLayoutBackend(), PdfminerBackend(), PymupdfBackend()):
+    register_backend(_backend)
+
+
+def backend_names() -> list:
+    return list(_backends)
+
+
+def available_backends() -> list:
+    return [backend for backend in _backends.values() if backend.available()]
+
+
+def load_bench_results(path: str = EXTRACTOR_BENCH_FILE) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def preferred_backend(backends: dict, corpus_size: int) -> str:
+    """Fastest backend among those with the best fidelity, if it clearly beats the default
+
+    backends maps a name to its benchmark result. A non-default backend is
+    only preferred over a corpus of at least EXTRACTOR_MIN_CORPUS PDFs, and
+    only when the default scores lower or is EXTRACTOR_MIN_SPEEDUP times slower.
+    """
+    if not backends or DEFAULT_BACKEND not in backends or corpus_size < EXTRACTOR_MIN_CORPUS:
+        return DEFAULT_BACKEND
+    best = max((result["fidelity"] or 0.0) for result in backends.values())
+    candidates = [name for name, result in backends.items() if (result["fidelity"] or 0.0) >= best]
+    fastest = max(candidates, key=lambda name: backends[name]["pages_per_second"])
+    if DEFAULT_BACKEND in candidates:
+        default_speed = backends[DEFAULT_BACKEND]["pages_per_second"]
+        if backends[fastest]["pages_per_second"] < default_speed * EXTRACTOR_MIN_SPEEDUP:
+            return DEFAULT_BACKEND
+    return fastest
+
+
+def _auto_backend() -> str:
+    """Backend the last benchmark run clearly favours, if it is still installed"""
+    results = load_bench_results()
+    selected = preferred_backend(results.get("backends") or {}, len(results.get("corpus") or ()))
+    if selected in _backends and _backends[selected].available():
+        return selected
+    return DEFAULT_BACKEND
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: str = None) -> ExtractorBackend:
+    """Backend by name; defaults to PDF_EXTRACTOR, where "auto" means the benchmark's pick"""
+    name = (name or PDF_EXTRACTOR).lower()
+    if name == "auto":
+        name = _auto_backend()
+    backend = _backends.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown PDF extractor '{name}'. Choose from: auto, {', '.join(_backends)}")
+    if not backend.available():
+        raise ValueError(f"PDF extractor '{name}' needs the {backend.module} package")
+    return backend
@@ -0,0 +1,98 @@
+## Streaming upload ingest
+import os
+import hashlib
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from executors import run_io
+
+# Read uploads in bounded chunks so peak memory per request stays constant
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 64 * 1024))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 25 * 1024 * 1024))
+
+# Analyze uploads straight from memory instead of writing them to data/ first
+IN_MEMORY_ANALYSIS = os.getenv("IN_MEMORY_ANALYSIS", "true").lower() in ("1", "true", "yes")
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured maximum size"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File exceeds maximum upload size of {max_size} bytes")
+
+
+@dataclass
+class SavedUpload:
+    """Result of streaming an upload to disk"""
+    path: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class BufferedUpload:
+    """Result of reading an upload into memory"""
+    data: bytes
+    size: int
+    sha256: str
+
+
+async def save_upload(
+    file,
+    file_path: str,
+    max_size: int = MAX_UPLOAD_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SavedUpload:
+    """Stream an UploadFile to disk chunk by chunk, hashing and size-checking as it goes
+
+    The partially written file is removed if the size limit is exceeded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    # File operations run on the I/O pool so the event loop never blocks on disk
+    f = await run_io(open, file_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(max_size)
+            digest.update(chunk)
+            await run_io(f.write, chunk)
+    except UploadTooLarge:
+        await run_io(f.close)
+        if os.path.exists(file_path):
+            await run_io(os.remove, file_path)
+        raise
+    await run_io(f.close)
+
+    return SavedUpload(path=file_path, size=size, sha256=digest.hexdigest())
+
+
+async def read_upload(
+    file,
+    max_size: int = MAX_UPLOAD_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> BufferedUpload:
+    """Read an UploadFile into memory chunk by chunk, hashing and size-checking as it goes"""
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLarge(max_size)
+        digest.update(chunk)
+        chunks.append(chunk)
+
+    return BufferedUpload(data=b"".join(chunks), size=size, sha256=digest.hexdigest())
@@ -0,0 +1,222 @@
+## Asynchronous analysis jobs backed by a persistent SQLite queue
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Relative paths resolve against the app directory, not the working directory
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DB = os.path.join(_APP_DIR, os.getenv("JOBS_DB", "data/jobs.db"))
+# Uploads for queued jobs are kept here until the job finishes
+JOBS_DIR = os.path.join(_APP_DIR, os.getenv("JOBS_DIR", "data/jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def job_file_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"blood_test_report_{job_id}.pdf")
+
+
+class JobStore:
+    """SQLite-backed job table; queued and running jobs survive a restart"""
+
+    def __init__(self, db_path: str = JOBS_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    analysis_type TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    filename TEXT,
+                    progress TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, analysis_type: str, query: str, file_path: str,
+               filename: str, steps: list) -> dict:
+        now = time.time()
+        progress = {step: "pending" for step in steps}
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, analysis_type, query, file_path, filename, progress, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, analysis_type, query, file_path, filename, json.dumps(progress), now, now),
+            )
+        return self.get(job_id)
+
+    def claim_next(self) -> Optional[dict]:
+        """Atomically move the oldest queued job to running and return it"""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row[0])
+            )
+            conn.execute("COMMIT")
+        return self.get(row[0])
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a restart back on the queue"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def update_progress(self, job_id: str, step: str, status: str):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row[0])
+            progress[step] = status
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, result: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, updated_at = ? WHERE id = ?",
+                (result, time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class JobWorkerPool:
+    """Worker threads that pull jobs from a JobStore and run them
+
+    executor(job, progress) returns the analysis text; progress(step, status)
+    records per-step progress on the job.
+    """
+
+    def __init__(self, store: JobStore, executor, workers: int = JOB_WORKERS,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.store = store
+        self.executor = executor
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        requeued = self.store.requeue_running()
+        if requeued:
+            print(f"🔁 Requeued {requeued} interrupted job(s)")
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers after a job has been queued"""
+        self._wake.set()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+
+        def progress(step: str, status: str):
+            self.store.update_progress(job_id, step, status)
+
+        try:
+            result = self.executor(job, progress)
+            self.store.finish(job_id, str(result))
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {str(e)}")
+            self.store.fail(job_id, str(e))
+        finally:
+            if os.path.exists(job["file_path"]):
+                try:
+                    os.remove(job["file_path"])
+                except Exception:
+                    pass
+
+
+def job_response(job: dict) -> dict:
+    """Public view of a job for GET /jobs/{id}"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "analysis_type": job["analysis_type"],
+        "query": job["query"],
+        "file_processed": job["filename"],
+        "progress": job["progress"],
+        "analysis": job["result"],
+        "error": job["error"],
+    }
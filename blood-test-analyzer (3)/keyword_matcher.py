@@ -0,0 +1,61 @@
+## Topic keyword tables matched once per report text and shared by every tool
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class KeywordMatcher:
+    """Which topics of a keyword table occur in a normalized report text
+
+    topics maps a topic name to its keywords; a topic is present when any of
+    its keywords is a substring of the text, exactly like the chained `in`
+    tests it replaces. scan() searches each distinct keyword at most once,
+    skips keywords whose topics are already found and stops once every topic
+    is found. With normalize, scan() takes raw report text and normalizes it
+    first. Results are cached under a SHA-256 of the text, never the text
+    itself, so tools scanning the same report share one scan without pinning
+    report strings in memory.
+    """
+
+    def __init__(self, topics: dict, cache_size: int = 64, normalize=None):
+        self.topics = {topic: tuple(keywords) for topic, keywords in topics.items()}
+        self._keywords = {}
+        for topic, keywords in self.topics.items():
+            for keyword in keywords:
+                self._keywords.setdefault(keyword, set()).add(topic)
+        # Keywords shared by several topics first: one search settles more of the table
+        self._order = sorted(self._keywords, key=lambda keyword: -len(self._keywords[keyword]))
+        self._normalize = normalize
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scan(self, text: str) -> frozenset:
+        key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+        with self._lock:
+            found = self._cache.get(key)
+            if found is not None:
+                self._cache.move_to_end(key)
+                return found
+        found = self._scan(self._normalize(text) if self._normalize else text)
+        with self._lock:
+            self._cache[key] = found
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _scan(self, text: str) -> frozenset:
+        found = set()
+        for keyword in self._order:
+            topics = self._keywords[keyword]
+            if topics <= found:
+                continue
+            if keyword in text:
+                found |= topics
+                if len(found) == len(self.topics):
+                    break
+        return frozenset(found)
@@ -1,54 +1,69 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Header, Response
 import os
 import uuid
 import asyncio
 from typing import Optional
 
-from crewai import Crew, Process
 from agents import doctor, nutritionist, exercise_specialist, verifier
-from task import help_patients, nutrition_analysis, exercise_planning, verification
+from task import ANALYSIS_TASKS
+from crew_pool import CrewPool
+from extraction_context import extraction_context, extraction_context_stats
+from ingest import save_upload, read_upload, UploadTooLarge, IN_MEMORY_ANALYSIS
+from pdf_extractor import register_document, release_document, is_memory_ref
+from extraction_cache import extraction_cache
+from executors import run_io, run_analysis, extraction_sandbox_stats
+from pdf_sniff import sniff_pdf
+from extraction_sandbox import ExtractionRejected
+from admission import admission, AdmissionRejected
+from response_cache import response_cache, response_key, etag, etag_matches, crew_prompt_version
+from response_compression import CompressionMiddleware, compression_stats
+from streaming import stream_sections, stream_media_type, StreamCleanup, CleanupStreamingResponse
+from jobs import JobStore, JobWorkerPool, JOBS_DIR, new_job_id, job_file_path, job_response
 
 app = FastAPI(title="Blood Test Report Analyser", version="1.0.0")
+# Compress responses per Accept-Encoding; streamed responses pass through
+app.add_middleware(CompressionMiddleware)
 
-def run_crew(query: str, file_path: str, analysis_type: str = "comprehensive"):
+# Ready-built crews per analysis type, checked out by each request
+crew_pool = CrewPool(ANALYSIS_TASKS, agents=[doctor, nutritionist, exercise_specialist, verifier])
+# Cached responses are tied to the current task prompts, agents and models
+ENGINE_VERSION = crew_prompt_version(ANALYSIS_TASKS)
+
+def run_crew(query: str, file_path: str, analysis_type: str = "comprehensive", progress=None, on_output=None):
     """Run the medical analysis crew based on the specified analysis type"""
     
     try:
-        if analysis_type == "verification":
-            medical_crew = Crew(
-                agents=[verifier],
-                tasks=[verification],
-                process=Process.sequential,
-                verbose=True
-            )
-        elif analysis_type == "nutrition":
-            medical_crew = Crew(
-                agents=[doctor, nutritionist],
-                tasks=[help_patients, nutrition_analysis],
-                process=Process.sequential,
-                verbose=True
-            )
-        elif analysis_type == "exercise":
-            medical_crew = Crew(
-                agents=[doctor, exercise_specialist],
-                tasks=[help_patients, exercise_planning],
-                process=Process.sequential,
-                verbose=True
-            )
-        else:  # comprehensive analysis
-            medical_crew = Crew(
-                agents=[doctor, nutritionist, exercise_specialist],
-                tasks=[help_patients, nutrition_analysis, exercise_planning],
-                process=Process.sequential,
-                verbose=True
-            )
-        
-        result = medical_crew.kickoff({'query': query, 'file_path': file_path})
-        return result
+        # One extraction per request, shared by every agent and task in the crew
+        with extraction_context(file_path) as context, crew_pool.checkout(analysis_type) as crews:
+            # Extract up front so a report over the sandbox budgets fails before any LLM call
+            context.pages()
+            return crews.run({'query': query, 'file_path': file_path}, progress=progress, on_output=on_output)
         
+    except ExtractionRejected:
+        raise
     except Exception as e:
         raise Exception(f"Error running medical crew: {str(e)}")
 
+def run_crew_job(job: dict, progress) -> str:
+    """Job executor: run the crew for a queued /jobs request"""
+    return str(run_crew(job["query"], job["file_path"], job["analysis_type"], progress=progress))
+
+# Persistent job queue for long-running analyses, opened on start-up rather than at import
+job_store = None
+job_workers = None
+
+@app.on_event("startup")
+async def start_job_workers():
+    global job_store, job_workers
+    job_store = JobStore()
+    job_workers = JobWorkerPool(job_store, run_crew_job)
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if job_workers is not None:
+        job_workers.stop()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -57,6 +72,9 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze": "/analyze - Upload and analyze blood test reports",
+            "stream": "/analyze/stream - Same as /analyze, each task's output streams as SSE or NDJSON",
+            "jobs": "/jobs - Queue an analysis and poll /jobs/{job_id} for the result",
+            "metrics": "/metrics - Admission control queue depth and rejections",
             "health": "/ - Health check"
         }
     }
@@ -67,14 +85,29 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "Blood Test Report Analyser",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "extraction_cache": extraction_cache.stats(),
+        "crew_pool": crew_pool.stats(),
+        "extraction_context": extraction_context_stats(),
+        "response_cache": response_cache.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Admission control, extraction sandbox and compression metrics"""
+    return {
+        "admission": admission.stats(),
+        "extraction_sandbox": extraction_sandbox_stats(),
+        "compression": compression_stats()
     }
 
 @app.post("/analyze")
 async def analyze_blood_report(
     file: UploadFile = File(...),
     query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
-    analysis_type: str = Form(default="comprehensive")
+    analysis_type: str = Form(default="comprehensive"),
+    if_none_match: Optional[str] = Header(default=None),
+    http_response: Response = None
 ):
     """
     Analyze blood test report and provide comprehensive health recommendations
@@ -93,16 +126,33 @@ async def analyze_blood_report(
     file_id = str(uuid.uuid4())
     file_path = f"data/blood_test_report_{file_id}.pdf"
     
+    # Admission control: wait for a free slot, or shed load with 429 when the queue is full
     try:
-        # Ensure data directory exists
-        os.makedirs("data", exist_ok=True)
-        
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="Uploaded file is empty")
-            f.write(content)
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    try:
+        if IN_MEMORY_ANALYSIS:
+            # Keep the upload in memory; tools resolve the memory:// reference
+            upload = await read_upload(file)
+            file_path = register_document(upload.data, upload.sha256)
+        else:
+            # Ensure data directory exists
+            await run_io(os.makedirs, "data", exist_ok=True)
+            
+            # Stream uploaded file to disk
+            upload = await save_upload(file, file_path)
+        if upload.size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, file_path)
+        if not probe.ok:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
         
         # Validate query
         if not query or query.strip() == "":
@@ -114,11 +164,21 @@ async def analyze_blood_report(
             analysis_type = "comprehensive"
             
         # Process the blood report with selected analysis type
-        response = run_crew(
-            query=query.strip(), 
-            file_path=file_path,
-            analysis_type=analysis_type
-        )
+        # Repeats of the same report, query and analysis type are answered from the response cache
+        cache_key = response_key(upload.sha256, query.strip(), analysis_type, ENGINE_VERSION)
+        http_response.headers["ETag"] = etag(cache_key)
+        response = response_cache.get(cache_key)
+        if response is not None and etag_matches(if_none_match, cache_key):
+            return Response(status_code=304, headers={"ETag": etag(cache_key)})
+        if response is None:
+            response = await run_analysis(
+                analysis_type,
+                run_crew,
+                query=query.strip(), 
+                file_path=file_path,
+                analysis_type=analysis_type
+            )
+            response_cache.put(cache_key, str(response))
         
         return {
             "status": "success",
@@ -129,18 +189,174 @@ async def analyze_blood_report(
             "disclaimer": "This analysis is for informational purposes only and should not replace professional medical consultation."
         }
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExtractionRejected as e:
+        raise HTTPException(status_code=422, detail=f"Report rejected: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing blood report: {str(e)}")
     
     finally:
+        admission.release(ticket)
         # Clean up uploaded file
-        if os.path.exists(file_path):
+        if is_memory_ref(file_path):
+            release_document(file_path)
+        elif os.path.exists(file_path):
+            try:
+                await run_io(os.remove, file_path)
+            except Exception:
+                pass  # Ignore cleanup errors
+
+@app.post("/analyze/stream")
+async def analyze_blood_report_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
+    analysis_type: str = Form(default="comprehensive")
+):
+    """
+    Analyze blood test report, streaming each crew task's output as soon as it finishes.
+    Sends Server-Sent Events when the client accepts text/event-stream, NDJSON otherwise.
+    """
+    
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    file_id = str(uuid.uuid4())
+    file_path = f"data/blood_test_report_{file_id}.pdf"
+    
+    # Admission control: wait for a free slot, or shed load with 429 when the queue is full
+    try:
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def cleanup():
+        admission.release(ticket)
+        if is_memory_ref(file_path):
+            release_document(file_path)
+        elif os.path.exists(file_path):
             try:
-                os.remove(file_path)
+                await run_io(os.remove, file_path)
             except Exception:
                 pass  # Ignore cleanup errors
+    
+    # Everything from here to the response runs under one cleanup, so no path leaks the slot
+    stream_cleanup = StreamCleanup(cleanup)
+    try:
+        if IN_MEMORY_ANALYSIS:
+            upload = await read_upload(file)
+            file_path = register_document(upload.data, upload.sha256)
+        else:
+            await run_io(os.makedirs, "data", exist_ok=True)
+            upload = await save_upload(file, file_path)
+        if upload.size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, file_path)
+        if not probe.ok:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
+        
+        if not query or query.strip() == "":
+            query = "Provide a comprehensive analysis of my blood test report"
+        
+        valid_types = ["comprehensive", "nutrition", "exercise", "verification"]
+        if analysis_type not in valid_types:
+            analysis_type = "comprehensive"
+        
+        def producer(emit):
+            run_crew(query.strip(), file_path, analysis_type, on_output=emit)
+        
+        media_type = stream_media_type(request.headers.get("accept", ""))
+        return CleanupStreamingResponse(
+            stream_sections(
+                producer,
+                analysis_type,
+                media_type,
+                start={"query": query, "file_processed": file.filename},
+                end={"disclaimer": "This analysis is for informational purposes only and should not replace professional medical consultation."},
+                cleanup=stream_cleanup
+            ),
+            stream_cleanup,
+            media_type=media_type
+        )
+    except UploadTooLarge as e:
+        stream_cleanup.close()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        # Also reached when the request is cancelled because the client went away
+        stream_cleanup.close()
+        raise
+
+@app.post("/jobs", status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
+    analysis_type: str = Form(default="comprehensive")
+):
+    """
+    Queue a blood test analysis and return its job ID immediately.
+    Poll GET /jobs/{job_id} for progress and the final result.
+    """
+    
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    job_id = new_job_id()
+    file_path = job_file_path(job_id)
+    
+    try:
+        # Queued uploads are kept on disk so they survive a restart
+        await run_io(os.makedirs, JOBS_DIR, exist_ok=True)
+        upload = await save_upload(file, file_path)
+        if upload.size == 0:
+            await run_io(os.remove, file_path)
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, file_path)
+        if not probe.ok:
+            await run_io(os.remove, file_path)
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if not query or query.strip() == "":
+        query = "Provide a comprehensive analysis of my blood test report"
+    
+    valid_types = ["comprehensive", "nutrition", "exercise", "verification"]
+    if analysis_type not in valid_types:
+        analysis_type = "comprehensive"
+    
+    await run_io(
+        job_store.create,
+        job_id,
+        analysis_type,
+        query.strip(),
+        file_path,
+        file.filename,
+        [task.name for task in ANALYSIS_TASKS[analysis_type]]
+    )
+    job_workers.notify()
+    
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Return status, per-step progress and, once finished, the analysis result"""
+    job = await run_io(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,10 +1,24 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Response
 import os
+import json
+import inspect
 import uuid
 from typing import Optional
 from datetime import datetime
+from ingest import save_upload, read_upload, UploadTooLarge, IN_MEMORY_ANALYSIS
+from pdf_extractor import get_file_info, register_document, release_document, is_memory_ref
+from extraction_cache import extraction_cache
+from executors import run_io, run_analysis, extraction_sandbox_stats
+from pdf_sniff import sniff_pdf, preflight_file_info
+from report_store import report_store, is_store_ref
+from extraction_sandbox import ExtractionRejected
+from admission import admission, AdmissionRejected
+from response_cache import response_cache, response_key, inputs_key, etag, etag_matches, prompt_version
+from response_compression import CompressionMiddleware, compression_stats
 
 app = FastAPI(title="🩺 Blood Test Report Analyzer - WORKING VERSION", version="1.0.0")
+# Compress responses per Accept-Encoding; streamed responses pass through
+app.add_middleware(CompressionMiddleware)
 
 class MedicalAnalyzer:
     """Self-contained medical analysis class"""
@@ -12,11 +26,32 @@ class MedicalAnalyzer:
     def __init__(self):
         self.name = "Medical AI Analyzer"
     
-    def analyze_blood_test(self, file_path: str, query: str, analysis_type: str):
-        """Analyze blood test and return comprehensive results"""
-        
-        # Extract basic file info
-        file_info = self._get_file_info(file_path)
+    def analyze_blood_test(self, source, query: str, analysis_type: str, source_name: str = "", probe=None):
+        """Analyze blood test and return comprehensive results
+
+        source may be a file path (CLI/batch use), raw PDF bytes, a binary buffer or a
+        store://<sha256> reference to a report in the report store. source_name is the
+        uploaded file name the report store keeps with the report. probe is the upload's
+        PdfProbe when the caller has already sniffed it.
+        """
+        return self.render_report(self.report_inputs(source, analysis_type, source_name, probe), query, analysis_type)
+    
+    def report_inputs(self, source, analysis_type: str, source_name: str = "", probe=None) -> dict:
+        """What a report reads from the document: the expensive part of an analysis, JSON-ready"""
+        # Verification only needs size, page count and text layer: answer it from the pre-flight probe
+        file_info = preflight_file_info(source, probe) if analysis_type == "verification" else None
+        if file_info is None:
+            # Extract basic file info
+            file_info = self._get_file_info(source)
+            
+            # Keep a parsed copy so re-analysis can reopen it from the report store; the full
+            # extraction that needs runs on the I/O pool, off the request path
+            report_store.persist_later(source, source_name=source_name)
+        return {"file_info": {"size": file_info['size'], "pages": file_info['pages'], "extracted": file_info['extracted']}}
+    
+    def render_report(self, inputs: dict, query: str, analysis_type: str) -> str:
+        """Report text for one request's query and the current date"""
+        file_info = inputs["file_info"]
         
         # Generate analysis based on type
         if analysis_type == "verification":
@@ -28,47 +63,11 @@ class MedicalAnalyzer:
         else:  # comprehensive
             return self._comprehensive_analysis(query, file_info)
     
-    def _get_file_info(self, file_path: str):
-        """Extract basic file information"""
-        try:
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                
-                # Try to extract PDF text
-                try:
-                    from pypdf import PdfReader
-                    reader = PdfReader(file_path)
-                    text_content = ""
-                    for page in reader.pages:
-                        text_content += page.extract_text() + "\n"
-                    
-                    return {
-                        "size": file_size,
-                        "content": text_content[:1000],  # First 1000 chars
-                        "pages": len(reader.pages),
-                        "extracted": True
-                    }
-                except:
-                    return {
-                        "size": file_size,
-                        "content": "Blood test data processed successfully",
-                        "pages": 1,
-                        "extracted": False
-                    }
-            else:
-                return {
-                    "size": 0,
-                    "content": "File processed",
-                    "pages": 1,
-                    "extracted": False
-                }
-        except:
-            return {
-                "size": 0,
-                "content": "Blood test report ready for analysis",
-                "pages": 1,
-                "extracted": False
-            }
+    def _get_file_info(self, source):
+        """Extract basic file information from a path, bytes, buffer or store:// reference"""
+        if is_store_ref(source):
+            return report_store.resolve(source).file_info()
+        return get_file_info(source)
     
     def _comprehensive_analysis(self, query: str, file_info: dict):
         """Generate comprehensive medical analysis"""
@@ -322,6 +321,8 @@ Processing ID: {uuid.uuid4().hex[:8].upper()}
 
 # Initialize the analyzer
 analyzer = MedicalAnalyzer()
+# Cached responses are tied to the current report text
+ENGINE_VERSION = prompt_version(inspect.getsource(MedicalAnalyzer))
 
 @app.get("/")
 async def root():
@@ -357,14 +358,27 @@ async def health_check():
             "pdf_processing": "✅ Working",
             "medical_analyzer": "✅ Ready"
         },
+        "extraction_cache": extraction_cache.stats(),
+        "response_cache": response_cache.stats(),
         "ready": True
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Admission control, extraction sandbox and compression metrics"""
+    return {
+        "admission": admission.stats(),
+        "extraction_sandbox": extraction_sandbox_stats(),
+        "compression": compression_stats()
+    }
+
 @app.post("/analyze")
 async def analyze_blood_report(
     file: UploadFile = File(...),
     query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
-    analysis_type: str = Form(default="comprehensive")
+    analysis_type: str = Form(default="comprehensive"),
+    if_none_match: Optional[str] = Header(default=None),
+    http_response: Response = None
 ):
     """
     🩺 Analyze blood test report and provide comprehensive health recommendations
@@ -376,14 +390,31 @@ async def analyze_blood_report(
     file_id = str(uuid.uuid4())
     file_path = f"data/blood_test_report_{file_id}.pdf"
     
+    # Admission control: wait for a free slot, or shed load with 429 when the queue is full
     try:
-        os.makedirs("data", exist_ok=True)
-        
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="File is empty")
-            f.write(content)
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    try:
+        if IN_MEMORY_ANALYSIS:
+            # Registered with the digest read_upload computed, so no later step hashes the bytes again
+            upload = await read_upload(file)
+            source = file_path = register_document(upload.data, upload.sha256)
+        else:
+            await run_io(os.makedirs, "data", exist_ok=True)
+            upload = await save_upload(file, file_path)
+            source = file_path
+        if upload.size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, source)
+        if not probe.ok:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
         
         if not query or query.strip() == "":
             query = "Provide a comprehensive analysis of my blood test report"
@@ -397,7 +428,20 @@ async def analyze_blood_report(
         print(f"🎯 Analysis Type: {analysis_type}")
         
         # Use our self-contained analyzer
-        analysis_result = analyzer.analyze_blood_test(file_path, query, analysis_type)
+        # Repeats of the same report and analysis type reuse the cached document inputs; the
+        # report itself is rendered per request, so its query and date are current
+        cache_key = inputs_key(upload.sha256, analysis_type, ENGINE_VERSION)
+        etag_key = response_key(upload.sha256, query, analysis_type, ENGINE_VERSION)
+        http_response.headers["ETag"] = etag(etag_key)
+        inputs = response_cache.get(cache_key)
+        if inputs is not None and etag_matches(if_none_match, etag_key):
+            return Response(status_code=304, headers={"ETag": etag(etag_key)})
+        if inputs is None:
+            inputs = await run_analysis(analysis_type, analyzer.report_inputs, source, analysis_type, file.filename, probe)
+            response_cache.put(cache_key, json.dumps(inputs))
+        else:
+            inputs = json.loads(inputs)
+        analysis_result = analyzer.render_report(inputs, query, analysis_type)
         
         return {
             "status": "success",
@@ -406,7 +450,7 @@ async def analyze_blood_report(
             "analysis_type": analysis_type,
             "analysis": analysis_result,
             "file_processed": file.filename,
-            "file_size": f"{len(content)} bytes",
+            "file_size": f"{upload.size} bytes",
             "processing_info": {
                 "analyzer": "Medical AI - Self-contained",
                 "processing_time": "< 5 seconds",
@@ -415,6 +459,10 @@ async def analyze_blood_report(
             "disclaimer": "⚠️ This analysis is for informational purposes only. Always consult healthcare professionals for medical decisions."
         }
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExtractionRejected as e:
+        raise HTTPException(status_code=422, detail=f"Report rejected: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
@@ -422,9 +470,12 @@ async def analyze_blood_report(
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
     
     finally:
-        if os.path.exists(file_path):
+        admission.release(ticket)
+        if is_memory_ref(file_path):
+            release_document(file_path)
+        elif os.path.exists(file_path):
             try:
-                os.remove(file_path)
+                await run_io(os.remove, file_path)
                 print(f"🗑️ Cleaned up: {file_path}")
             except:
                 pass
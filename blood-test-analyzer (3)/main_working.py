@@ -1,51 +1,42 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Response
 import os
 import uuid
 import asyncio
 from typing import Optional
 
-from crewai import Crew, Process
 from agents_mock import doctor, nutritionist, exercise_specialist, verifier
-from task import help_patients, nutrition_analysis, exercise_planning, verification
+from task import ANALYSIS_TASKS
+from crew_pool import CrewPool
+from extraction_context import extraction_context, extraction_context_stats
+from ingest import save_upload, UploadTooLarge
+from executors import run_io, run_analysis, extraction_sandbox_stats
+from pdf_sniff import sniff_pdf
+from extraction_sandbox import ExtractionRejected
+from admission import admission, AdmissionRejected
+from response_cache import response_cache, response_key, etag, etag_matches, crew_prompt_version
+from response_compression import CompressionMiddleware, compression_stats
 
 app = FastAPI(title="Blood Test Report Analyser - Working Version", version="1.0.0")
+# Compress responses per Accept-Encoding; streamed responses pass through
+app.add_middleware(CompressionMiddleware)
+
+# Ready-built crews per analysis type, checked out by each request
+crew_pool = CrewPool(ANALYSIS_TASKS, agents=[doctor, nutritionist, exercise_specialist, verifier])
+# Cached responses are tied to the current task prompts, agents and models
+ENGINE_VERSION = crew_prompt_version(ANALYSIS_TASKS)
 
 def run_crew(query: str, file_path: str, analysis_type: str = "comprehensive"):
     """Run the medical analysis crew based on the specified analysis type"""
     
     try:
-        if analysis_type == "verification":
-            medical_crew = Crew(
-                agents=[verifier],
-                tasks=[verification],
-                process=Process.sequential,
-                verbose=True
-            )
-        elif analysis_type == "nutrition":
-            medical_crew = Crew(
-                agents=[doctor, nutritionist],
-                tasks=[help_patients, nutrition_analysis],
-                process=Process.sequential,
-                verbose=True
-            )
-        elif analysis_type == "exercise":
-            medical_crew = Crew(
-                agents=[doctor, exercise_specialist],
-                tasks=[help_patients, exercise_planning],
-                process=Process.sequential,
-                verbose=True
-            )
-        else:  # comprehensive analysis
-            medical_crew = Crew(
-                agents=[doctor, nutritionist, exercise_specialist],
-                tasks=[help_patients, nutrition_analysis, exercise_planning],
-                process=Process.sequential,
-                verbose=True
-            )
-        
-        result = medical_crew.kickoff({'query': query, 'file_path': file_path})
-        return result
+        # One extraction per request, shared by every agent and task in the crew
+        with extraction_context(file_path) as context, crew_pool.checkout(analysis_type) as crews:
+            # Extract up front so a report over the sandbox budgets fails before any LLM call
+            context.pages()
+            return crews.run({'query': query, 'file_path': file_path})
         
+    except ExtractionRejected:
+        raise
     except Exception as e:
         raise Exception(f"Error running medical crew: {str(e)}")
 
@@ -85,14 +76,28 @@ async def health_check():
             "pdf_processing": "✅ Working",
             "file_upload": "✅ Working"
         },
-        "ready_for_analysis": True
+        "ready_for_analysis": True,
+        "crew_pool": crew_pool.stats(),
+        "extraction_context": extraction_context_stats(),
+        "response_cache": response_cache.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Admission control, extraction sandbox and compression metrics"""
+    return {
+        "admission": admission.stats(),
+        "extraction_sandbox": extraction_sandbox_stats(),
+        "compression": compression_stats()
     }
 
 @app.post("/analyze")
 async def analyze_blood_report(
     file: UploadFile = File(...),
     query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
-    analysis_type: str = Form(default="comprehensive")
+    analysis_type: str = Form(default="comprehensive"),
+    if_none_match: Optional[str] = Header(default=None),
+    http_response: Response = None
 ):
     """
     🩺 Analyze blood test report and provide comprehensive health recommendations
@@ -111,16 +116,28 @@ async def analyze_blood_report(
     file_id = str(uuid.uuid4())
     file_path = f"data/blood_test_report_{file_id}.pdf"
     
+    # Admission control: wait for a free slot, or shed load with 429 when the queue is full
+    try:
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
     try:
         # Ensure data directory exists
-        os.makedirs("data", exist_ok=True)
+        await run_io(os.makedirs, "data", exist_ok=True)
         
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="Uploaded file is empty")
-            f.write(content)
+        # Stream uploaded file to disk
+        upload = await save_upload(file, file_path)
+        if upload.size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, file_path)
+        if not probe.ok:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
         
         # Validate query
         if not query or query.strip() == "":
@@ -136,11 +153,21 @@ async def analyze_blood_report(
         print(f"📝 Query: {query}")
         print(f"🎯 Analysis type: {analysis_type}")
         
-        response = run_crew(
-            query=query.strip(), 
-            file_path=file_path,
-            analysis_type=analysis_type
-        )
+        # Repeats of the same report, query and analysis type are answered from the response cache
+        cache_key = response_key(upload.sha256, query.strip(), analysis_type, ENGINE_VERSION)
+        http_response.headers["ETag"] = etag(cache_key)
+        response = response_cache.get(cache_key)
+        if response is not None and etag_matches(if_none_match, cache_key):
+            return Response(status_code=304, headers={"ETag": etag(cache_key)})
+        if response is None:
+            response = await run_analysis(
+                analysis_type,
+                run_crew,
+                query=query.strip(), 
+                file_path=file_path,
+                analysis_type=analysis_type
+            )
+            response_cache.put(cache_key, str(response))
         
         return {
             "status": "success",
@@ -149,12 +176,16 @@ async def analyze_blood_report(
             "analysis_type": analysis_type,
             "analysis": str(response),
             "file_processed": file.filename,
-            "file_size": f"{len(content)} bytes",
+            "file_size": f"{upload.size} bytes",
             "model_used": "Mock Medical AI (No API Key Required)",
             "processing_time": "< 5 seconds",
             "disclaimer": "⚠️ This analysis is for informational purposes only and should not replace professional medical consultation. Always consult with your healthcare provider for proper medical interpretation and advice."
         }
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExtractionRejected as e:
+        raise HTTPException(status_code=422, detail=f"Report rejected: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
@@ -162,10 +193,11 @@ async def analyze_blood_report(
         raise HTTPException(status_code=500, detail=f"Error processing blood report: {str(e)}")
     
     finally:
+        admission.release(ticket)
         # Clean up uploaded file
         if os.path.exists(file_path):
             try:
-                os.remove(file_path)
+                await run_io(os.remove, file_path)
                 print(f"🗑️ Cleaned up temporary file: {file_path}")
             except Exception:
                 pass  # Ignore cleanup errors
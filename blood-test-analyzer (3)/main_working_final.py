@@ -1,83 +1,42 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Header, Response
 import os
+import json
+import time
 import uuid
-from typing import Optional
+import zipfile
+from typing import Optional, List
+from datetime import datetime
+from ingest import save_upload, read_upload, UploadTooLarge, IN_MEMORY_ANALYSIS
+from pdf_extractor import get_file_info, register_document, release_document, is_memory_ref
+from extraction_cache import extraction_cache
+from executors import run_io, run_analysis, extraction_sandbox_stats
+from pdf_sniff import sniff_pdf, preflight_file_info
+from report_template import ReportTemplate
+from structured_report import (
+    StructuredReport, STRUCTURED_FIELDS, DEFAULT_FIELDS, SECTION_FIELDS, parse_selector, findings, recommendations, flagged_biomarkers,
+)
+from biomarker_table import document_biomarkers
+from report_store import report_store, is_store_ref, store_ref
+from extraction_sandbox import ExtractionRejected
+from admission import admission, AdmissionRejected
+from response_cache import response_cache, response_key, inputs_key, etag, etag_matches, prompt_version
+from response_compression import CompressionMiddleware, ReportFragments, compressed_json_response, compression_stats
+from streaming import split_sections, stream_sections, stream_media_type, StreamCleanup, CleanupStreamingResponse
+from batch import BatchSpool, BatchTooLarge, expand_zip, ndjson_results
+from jobs import JobStore, JobWorkerPool, JOBS_DIR, new_job_id, job_file_path, job_response
 
 app = FastAPI(title="🩺 Blood Test Report Analyzer - FINAL WORKING VERSION", version="1.0.0")
+# Compress responses per Accept-Encoding; streamed responses pass through
+app.add_middleware(CompressionMiddleware)
 
-class MedicalAnalyzer:
-    """Self-contained medical analysis class"""
-    
-    def __init__(self):
-        self.name = "Medical AI Analyzer"
-    
-    def analyze_blood_test(self, file_path: str, query: str, analysis_type: str):
-        """Analyze blood test and return comprehensive results"""
-        
-        # Extract basic file info
-        file_info = self._get_file_info(file_path)
-        
-        # Generate analysis based on type
-        if analysis_type == "verification":
-            return self._document_verification(file_info)
-        elif analysis_type == "nutrition":
-            return self._nutrition_analysis(query, file_info)
-        elif analysis_type == "exercise":
-            return self._exercise_analysis(query, file_info)
-        else:  # comprehensive
-            return self._comprehensive_analysis(query, file_info)
-    
-    def _get_file_info(self, file_path: str):
-        """Extract basic file information"""
-        try:
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                
-                # Try to extract PDF text
-                try:
-                    from pypdf import PdfReader
-                    reader = PdfReader(file_path)
-                    text_content = ""
-                    for page in reader.pages:
-                        text_content += page.extract_text() + "\n"
-                    
-                    return {
-                        "size": file_size,
-                        "content": text_content[:1000],  # First 1000 chars
-                        "pages": len(reader.pages),
-                        "extracted": True
-                    }
-                except:
-                    return {
-                        "size": file_size,
-                        "content": "Blood test data processed successfully",
-                        "pages": 1,
-                        "extracted": False
-                    }
-            else:
-                return {
-                    "size": 0,
-                    "content": "File processed",
-                    "pages": 1,
-                    "extracted": False
-                }
-        except:
-            return {
-                "size": 0,
-                "content": "Blood test report ready for analysis",
-                "pages": 1,
-                "extracted": False
-            }
-    
-    def _comprehensive_analysis(self, query: str, file_info: dict):
-        """Generate comprehensive medical analysis"""
-        return f"""
+## Report templates: split into static segments and slots once at import
+COMPREHENSIVE_REPORT = ReportTemplate("""
 🩺 COMPREHENSIVE BLOOD TEST ANALYSIS REPORT
 
 📊 DOCUMENT PROCESSING:
-• File Size: {file_info['size']} bytes
-• Pages Processed: {file_info['pages']}
-• Content Extraction: {'✅ Successful' if file_info['extracted'] else '✅ Processed'}
+• File Size: {size} bytes
+• Pages Processed: {pages}
+• Content Extraction: {extraction}
 
 🔍 MEDICAL ANALYSIS:
 
@@ -171,21 +130,19 @@ This analysis is generated by AI for informational and educational purposes only
 4. Follow your doctor's specific guidance for your individual health needs
 
 Query Addressed: {query}
-Analysis Date: {self._get_current_date()}
+Analysis Date: {date}
 Report Generated By: Medical AI Analysis System
-"""
+""")
 
-    def _nutrition_analysis(self, query: str, file_info: dict):
-        """Generate detailed nutrition analysis"""
-        return f"""
+NUTRITION_REPORT = ReportTemplate("""
 🥗 COMPREHENSIVE NUTRITION ANALYSIS & DIETARY RECOMMENDATIONS
 
 📋 NUTRITIONAL ASSESSMENT OVERVIEW:
 Based on your blood test markers and health profile, here's a detailed nutritional analysis with personalized dietary recommendations.
 
 📊 DOCUMENT ANALYSIS:
-• File Processed: {file_info['size']} bytes
-• Content Analyzed: {'✅ Text extracted and analyzed' if file_info['extracted'] else '✅ Medical data processed'}
+• File Processed: {size} bytes
+• Content Analyzed: {extraction}
 
 🎯 MACRONUTRIENT OPTIMIZATION PLAN:
 
@@ -299,21 +256,19 @@ Based on your specific query: "{query}"
 ⚠️ PROFESSIONAL GUIDANCE:
 Always consult with a registered dietitian for personalized nutrition counseling, especially if you have specific health conditions or dietary restrictions.
 
-Report Generated: {self._get_current_date()}
+Report Generated: {date}
 Nutritional Analysis By: Clinical Nutrition AI System
-"""
+""")
 
-    def _exercise_analysis(self, query: str, file_info: dict):
-        """Generate detailed exercise analysis"""
-        return f"""
+EXERCISE_REPORT = ReportTemplate("""
 🏃‍♂️ PERSONALIZED EXERCISE PROGRAM & COMPREHENSIVE FITNESS PLAN
 
 💪 FITNESS ASSESSMENT & PROGRAM DESIGN:
 Based on your blood test results and health markers, here's a scientifically-designed exercise program to optimize your health, fitness, and overall well-being.
 
 📊 HEALTH DATA ANALYSIS:
-• File Processed: {file_info['size']} bytes
-• Health Markers Evaluated: {'✅ Comprehensive analysis completed' if file_info['extracted'] else '✅ Health data processed'}
+• File Processed: {size} bytes
+• Health Markers Evaluated: {extraction}
 
 🎯 EXERCISE PRESCRIPTION FRAMEWORK:
 
@@ -491,13 +446,11 @@ Always consult with your healthcare provider before beginning any new exercise p
 
 Remember: The best exercise program is the one you'll actually follow consistently. Start where you are, use what you have, and do what you can!
 
-Report Generated: {self._get_current_date()}
+Report Generated: {date}
 Exercise Program Designed By: Clinical Exercise Physiology AI System
-"""
+""")
 
-    def _document_verification(self, file_info: dict):
-        """Generate document verification report"""
-        return f"""
+VERIFICATION_REPORT = ReportTemplate("""
 ✅ COMPREHENSIVE DOCUMENT VERIFICATION & ANALYSIS REPORT
 
 📋 VERIFICATION STATUS: APPROVED FOR MEDICAL ANALYSIS
@@ -506,9 +459,9 @@ Exercise Program Designed By: Clinical Exercise Physiology AI System
 Your uploaded document has been successfully processed, analyzed, and verified as suitable for comprehensive medical blood test interpretation.
 
 📊 TECHNICAL ANALYSIS RESULTS:
-• File Size: {file_info['size']} bytes
-• Document Pages: {file_info['pages']} page(s)
-• Content Extraction: {'✅ Successful text extraction' if file_info['extracted'] else '✅ Binary data processed'}
+• File Size: {size} bytes
+• Document Pages: {pages} page(s)
+• Content Extraction: {extraction}
 • Processing Status: Complete and ready for analysis
 
 🎯 COMPREHENSIVE VERIFICATION CHECKLIST:
@@ -635,18 +588,248 @@ This verification confirms document structure, format, and technical suitability
 
 ✅ FINAL VERIFICATION STATUS: APPROVED FOR COMPREHENSIVE MEDICAL ANALYSIS
 
-Document Verified: {self._get_current_date()}
+Document Verified: {date}
 Verification System: Medical Document Analysis AI
-Processing ID: {uuid.uuid4().hex[:8].upper()}
-"""
+Processing ID: {processing_id}
+""")
+
+# Content Extraction wording per analysis type: (text extracted, binary only)
+EXTRACTION_STATUS = {
+    "comprehensive": ("✅ Successful", "✅ Processed"),
+    "nutrition": ("✅ Text extracted and analyzed", "✅ Medical data processed"),
+    "exercise": ("✅ Comprehensive analysis completed", "✅ Health data processed"),
+    "verification": ("✅ Successful text extraction", "✅ Binary data processed"),
+}
+
+## Structured reports: the same templates split into typed sections once at import
+STRUCTURED_REPORTS = {
+    "comprehensive": StructuredReport(COMPREHENSIVE_REPORT),
+    "nutrition": StructuredReport(NUTRITION_REPORT),
+    "exercise": StructuredReport(EXERCISE_REPORT),
+    "verification": StructuredReport(VERIFICATION_REPORT),
+}
+# Slots filled from the PDF; sections without them never read it
+DOCUMENT_SLOTS = {"size", "pages", "extraction"}
+
+# Static template text, JSON-escaped and compressed once per encoding for /analyze responses
+REPORT_FRAGMENTS = {
+    "comprehensive": ReportFragments(COMPREHENSIVE_REPORT),
+    "nutrition": ReportFragments(NUTRITION_REPORT),
+    "exercise": ReportFragments(EXERCISE_REPORT),
+    "verification": ReportFragments(VERIFICATION_REPORT),
+}
+
+class MedicalAnalyzer:
+    """Self-contained medical analysis class"""
+    
+    def __init__(self):
+        self.name = "Medical AI Analyzer"
+        # (unix second, formatted date) shared by every report rendered in that second
+        self._date = (None, "")
+    
+    def analyze_blood_test(self, source, query: str, analysis_type: str, source_name: str = "", probe=None):
+        """Analyze blood test and return comprehensive results
+
+        source may be a file path (CLI/batch use), raw PDF bytes, a binary buffer or a
+        store://<sha256> reference to a report in the report store. source_name is the
+        uploaded file name the report store keeps with the report. probe is the upload's
+        PdfProbe when the caller has already sniffed it.
+        """
+        
+        return self.render_report(self.report_inputs(source, analysis_type, source_name, probe), query, analysis_type)
+    
+    def report_inputs(self, source, analysis_type: str, source_name: str = "", probe=None) -> dict:
+        """What a text report reads from the document: the expensive part of an analysis, JSON-ready"""
+        return {"file_info": self._document_info(self._report_file_info(source, analysis_type, source_name, probe))}
+    
+    def render_report(self, inputs: dict, query: str, analysis_type: str) -> str:
+        """Report text for one request's query, the current date and a fresh processing ID"""
+        file_info = inputs["file_info"]
+        
+        # Generate analysis based on type
+        if analysis_type == "verification":
+            return self._document_verification(file_info)
+        elif analysis_type == "nutrition":
+            return self._nutrition_analysis(query, file_info)
+        elif analysis_type == "exercise":
+            return self._exercise_analysis(query, file_info)
+        else:  # comprehensive
+            return self._comprehensive_analysis(query, file_info)
+    
+    def analyze_structured(self, source, query: str, analysis_type: str, fields=(), sections=(), source_name: str = "",
+                           probe=None):
+        """Analyze blood test and return the report as typed fields
+
+        fields picks from STRUCTURED_FIELDS (default DEFAULT_FIELDS) and sections from
+        the analysis type's section ids (default all). Only the selected parts are
+        built, and the PDF is not read unless they need document details.
+        """
+        inputs = self.structured_inputs(source, analysis_type, fields, sections, source_name, probe)
+        return self.render_structured(inputs, query, analysis_type, fields, sections)
+    
+    def structured_inputs(self, source, analysis_type: str, fields=(), sections=(), source_name: str = "",
+                          probe=None) -> dict:
+        """What the selected structured fields read from the document, JSON-ready"""
+        report = STRUCTURED_REPORTS[analysis_type]
+        fields = set(fields or DEFAULT_FIELDS)
+        selected = report.select(sections) if fields & SECTION_FIELDS else []
+        
+        inputs = {}
+        if "document" in fields or report.uses(DOCUMENT_SLOTS, selected):
+            inputs["file_info"] = self._document_info(self._report_file_info(source, analysis_type, source_name, probe))
+        if "flagged_biomarkers" in fields:
+            inputs["flagged_biomarkers"] = flagged_biomarkers(self._get_biomarkers(source))
+        return inputs
+    
+    def render_structured(self, inputs: dict, query: str, analysis_type: str, fields=(), sections=()) -> dict:
+        """Structured fields for one request's query, the current date and a fresh processing ID"""
+        report = STRUCTURED_REPORTS[analysis_type]
+        fields = set(fields or DEFAULT_FIELDS)
+        selected = report.select(sections) if fields & SECTION_FIELDS else []
+        
+        slots = {"query": query, "date": self._get_current_date(), "processing_id": uuid.uuid4().hex[:8].upper()}
+        file_info = inputs.get("file_info")
+        if file_info is not None:
+            slots.update(
+                size=file_info['size'],
+                pages=file_info['pages'],
+                extraction=EXTRACTION_STATUS[analysis_type][0 if file_info['extracted'] else 1],
+            )
+        
+        rendered = report.render(selected, slots)
+        result = {}
+        if "document" in fields:
+            result["document"] = {
+                "size": file_info['size'],
+                "pages": file_info['pages'],
+                "extracted": file_info['extracted'],
+                "extraction": slots["extraction"],
+            }
+        if "sections" in fields:
+            result["sections"] = rendered
+        if "findings" in fields:
+            result["findings"] = findings(rendered)
+        if "recommendations" in fields:
+            result["recommendations"] = recommendations(rendered)
+        if "flagged_biomarkers" in fields:
+            result["flagged_biomarkers"] = inputs["flagged_biomarkers"]
+        return result
+    
+    def stream_blood_test(self, source, query: str, analysis_type: str, emit, source_name: str = "", probe=None):
+        """Analyze blood test and emit(section, content) for each report section"""
+        report = self.analyze_blood_test(source, query, analysis_type, source_name, probe)
+        for section, content in split_sections(report):
+            emit(section, content)
+    
+    def _report_file_info(self, source, analysis_type: str, source_name: str = "", probe=None):
+        """File info for a report, from the pre-flight probe when that is enough"""
+        # Verification only needs size, page count and text layer: answer it from the pre-flight probe
+        if analysis_type == "verification":
+            file_info = preflight_file_info(source, probe)
+            if file_info is not None:
+                return file_info
+        
+        # Extract basic file info
+        file_info = self._get_file_info(source)
+        
+        # Keep a parsed copy so re-analysis can reopen it from the report store; the full
+        # extraction that needs runs on the I/O pool, off the request path
+        report_store.persist_later(source, source_name=source_name)
+        return file_info
+    
+    @staticmethod
+    def _document_info(file_info: dict) -> dict:
+        """The file_info values reports are rendered from"""
+        return {"size": file_info['size'], "pages": file_info['pages'], "extracted": file_info['extracted']}
+    
+    def _get_biomarkers(self, source):
+        """BiomarkerTable for a path, bytes, buffer or store:// reference"""
+        if is_store_ref(source):
+            return report_store.resolve(source).biomarkers()
+        return document_biomarkers(source)
+    
+    def _get_file_info(self, source):
+        """Extract basic file information from a path, bytes, buffer or store:// reference"""
+        if is_store_ref(source):
+            return report_store.resolve(source).file_info()
+        return get_file_info(source)
+    
+    def _comprehensive_analysis(self, query: str, file_info: dict):
+        """Generate comprehensive medical analysis"""
+        return COMPREHENSIVE_REPORT.render(
+            size=file_info['size'],
+            pages=file_info['pages'],
+            extraction=EXTRACTION_STATUS['comprehensive'][0 if file_info['extracted'] else 1],
+            query=query,
+            date=self._get_current_date(),
+        )
+
+    def _nutrition_analysis(self, query: str, file_info: dict):
+        """Generate detailed nutrition analysis"""
+        return NUTRITION_REPORT.render(
+            size=file_info['size'],
+            extraction=EXTRACTION_STATUS['nutrition'][0 if file_info['extracted'] else 1],
+            query=query,
+            date=self._get_current_date(),
+        )
+
+    def _exercise_analysis(self, query: str, file_info: dict):
+        """Generate detailed exercise analysis"""
+        return EXERCISE_REPORT.render(
+            size=file_info['size'],
+            extraction=EXTRACTION_STATUS['exercise'][0 if file_info['extracted'] else 1],
+            query=query,
+            date=self._get_current_date(),
+        )
+
+    def _document_verification(self, file_info: dict):
+        """Generate document verification report"""
+        return VERIFICATION_REPORT.render(
+            size=file_info['size'],
+            pages=file_info['pages'],
+            extraction=EXTRACTION_STATUS['verification'][0 if file_info['extracted'] else 1],
+            date=self._get_current_date(),
+            processing_id=uuid.uuid4().hex[:8].upper(),
+        )
 
     def _get_current_date(self):
-        """Get current date for reports"""
-        from datetime import datetime
-        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        """Get current date for reports, formatted once per second"""
+        second = int(time.time())
+        cached = self._date
+        if cached[0] != second:
+            cached = (second, datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S"))
+            self._date = cached
+        return cached[1]
 
 # Initialize the analyzer
 analyzer = MedicalAnalyzer()
+# Cached responses are tied to the current report templates
+ENGINE_VERSION = prompt_version(
+    COMPREHENSIVE_REPORT.source, NUTRITION_REPORT.source, EXERCISE_REPORT.source, VERIFICATION_REPORT.source
+)
+
+def run_analyzer_job(job: dict, progress) -> str:
+    """Job executor: run MedicalAnalyzer for a queued /jobs request"""
+    progress("analysis", "running")
+    result = analyzer.analyze_blood_test(job["file_path"], job["query"], job["analysis_type"], job["filename"] or "")
+    progress("analysis", "completed")
+    return result
+
+# Persistent job queue for long-running analyses, opened on start-up rather than at import
+job_store = None
+job_workers = None
+
+@app.on_event("startup")
+async def start_job_workers():
+    global job_store, job_workers
+    job_store = JobStore()
+    job_workers = JobWorkerPool(job_store, run_analyzer_job)
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if job_workers is not None:
+        job_workers.stop()
 
 @app.get("/")
 async def root():
@@ -664,7 +847,12 @@ async def root():
             "⚡ Fast processing - results in seconds"
         ],
         "endpoints": {
-            "analyze": "/analyze - Upload blood test PDFs",
+            "analyze": "/analyze - Upload blood test PDFs; structured=true, fields= or sections= return typed JSON",
+            "stream": "/analyze/stream - Same as /analyze, sections stream as SSE or NDJSON",
+            "batch": "/analyze/batch - Upload many PDFs or a zip, results stream as NDJSON",
+            "jobs": "/jobs - Queue an analysis and poll /jobs/{job_id} for the result",
+            "reports": "/reports - Stored parsed reports; POST /reports/{sha256}/analyze re-runs an analysis without the PDF",
+            "metrics": "/metrics - Admission control queue depth and rejections",
             "health": "/health - System status",
             "docs": "/docs - Interactive documentation"
         }
@@ -683,17 +871,40 @@ async def health_check():
             "pdf_processing": "✅ Working",
             "medical_analyzer": "✅ Ready"
         },
+        "extraction_cache": extraction_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "report_store": report_store.stats(),
         "ready": True
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Admission control, extraction sandbox and compression metrics"""
+    return {
+        "admission": admission.stats(),
+        "extraction_sandbox": extraction_sandbox_stats(),
+        "compression": compression_stats()
+    }
+
 @app.post("/analyze")
 async def analyze_blood_report(
     file: UploadFile = File(...),
     query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
-    analysis_type: str = Form(default="comprehensive")
+    analysis_type: str = Form(default="comprehensive"),
+    structured: bool = Form(default=False),
+    fields: Optional[str] = Form(default=None),
+    sections: Optional[str] = Form(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None)
 ):
     """
     🩺 Analyze blood test report and provide comprehensive health recommendations
+
+    With structured=true (implied by fields or sections), analysis is a JSON object
+    of typed fields instead of one preformatted string. fields (comma-separated:
+    document, sections, findings, recommendations, flagged_biomarkers; default
+    document, sections, flagged_biomarkers) and sections (section ids of the
+    analysis type) limit what is built and returned.
     """
     
     if not file.filename.lower().endswith('.pdf'):
@@ -702,14 +913,31 @@ async def analyze_blood_report(
     file_id = str(uuid.uuid4())
     file_path = f"data/blood_test_report_{file_id}.pdf"
     
+    # Admission control: wait for a free slot, or shed load with 429 when the queue is full
     try:
-        os.makedirs("data", exist_ok=True)
-        
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="File is empty")
-            f.write(content)
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    try:
+        if IN_MEMORY_ANALYSIS:
+            # Registered with the digest read_upload computed, so no later step hashes the bytes again
+            upload = await read_upload(file)
+            source = file_path = register_document(upload.data, upload.sha256)
+        else:
+            await run_io(os.makedirs, "data", exist_ok=True)
+            upload = await save_upload(file, file_path)
+            source = file_path
+        if upload.size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, source)
+        if not probe.ok:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
         
         if not query or query.strip() == "":
             query = "Provide a comprehensive analysis of my blood test report"
@@ -722,25 +950,62 @@ async def analyze_blood_report(
         print(f"📝 Query: {query}")
         print(f"🎯 Analysis Type: {analysis_type}")
         
+        # Structured output: validate the selection before any analysis work
+        structured = structured or bool(fields or sections)
+        variant = ""
+        if structured:
+            try:
+                selected_fields = parse_selector(fields, STRUCTURED_FIELDS)
+                selected_sections = parse_selector(sections, STRUCTURED_REPORTS[analysis_type].section_ids, "sections")
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            variant = f"structured:{','.join(sorted(selected_fields))}:{','.join(sorted(selected_sections))}"
+        
         # Use our self-contained analyzer
-        analysis_result = analyzer.analyze_blood_test(file_path, query, analysis_type)
+        # Repeats of the same report and analysis type reuse the cached document inputs; the
+        # report itself is rendered per request, so its query, date and processing ID are current
+        cache_key = inputs_key(upload.sha256, analysis_type, ENGINE_VERSION, variant)
+        etag_key = response_key(upload.sha256, query, analysis_type, ENGINE_VERSION, variant)
+        inputs = response_cache.get(cache_key)
+        if inputs is not None and etag_matches(if_none_match, etag_key):
+            return Response(status_code=304, headers={"ETag": etag(etag_key)})
+        if inputs is None:
+            if structured:
+                inputs = await run_analysis(
+                    analysis_type, analyzer.structured_inputs, source, analysis_type, selected_fields, selected_sections,
+                    file.filename, probe
+                )
+            else:
+                inputs = await run_analysis(analysis_type, analyzer.report_inputs, source, analysis_type, file.filename, probe)
+            response_cache.put(cache_key, json.dumps(inputs))
+        else:
+            inputs = json.loads(inputs)
+        if structured:
+            analysis_result = analyzer.render_structured(inputs, query, analysis_type, selected_fields, selected_sections)
+        else:
+            analysis_result = analyzer.render_report(inputs, query, analysis_type)
         
-        return {
+        # Text reports are compressed around their precompressed template fragments
+        return compressed_json_response({
             "status": "success",
             "message": "✅ Blood test analysis completed successfully!",
             "query": query,
             "analysis_type": analysis_type,
             "analysis": analysis_result,
             "file_processed": file.filename,
-            "file_size": f"{len(content)} bytes",
+            "file_size": f"{upload.size} bytes",
             "processing_info": {
                 "analyzer": "Medical AI - Self-contained",
                 "processing_time": "< 5 seconds",
                 "analysis_depth": "Comprehensive"
             },
             "disclaimer": "⚠️ This analysis is for informational purposes only. Always consult healthcare professionals for medical decisions."
-        }
+        }, accept_encoding, None if structured else REPORT_FRAGMENTS[analysis_type], headers={"ETag": etag(etag_key)})
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExtractionRejected as e:
+        raise HTTPException(status_code=422, detail=f"Report rejected: {str(e)}")
     except HTTPException:
         raise
     except Exception as e:
@@ -748,13 +1013,291 @@ async def analyze_blood_report(
         raise HTTPException(status_code=500, detail=f"Processing error: {str(e)}")
     
     finally:
-        if os.path.exists(file_path):
+        admission.release(ticket)
+        if is_memory_ref(file_path):
+            release_document(file_path)
+        elif os.path.exists(file_path):
             try:
-                os.remove(file_path)
+                await run_io(os.remove, file_path)
                 print(f"🗑️ Cleaned up: {file_path}")
             except:
                 pass
 
+@app.post("/analyze/stream")
+async def analyze_blood_report_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
+    analysis_type: str = Form(default="comprehensive")
+):
+    """
+    🩺 Analyze blood test report, streaming each section as it is ready.
+    Sends Server-Sent Events when the client accepts text/event-stream, NDJSON otherwise.
+    """
+    
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Please upload a PDF file")
+    
+    file_id = str(uuid.uuid4())
+    file_path = f"data/blood_test_report_{file_id}.pdf"
+    
+    # Admission control: wait for a free slot, or shed load with 429 when the queue is full
+    try:
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def cleanup():
+        admission.release(ticket)
+        if is_memory_ref(file_path):
+            release_document(file_path)
+        elif os.path.exists(file_path):
+            try:
+                await run_io(os.remove, file_path)
+                print(f"🗑️ Cleaned up: {file_path}")
+            except:
+                pass
+    
+    # Everything from here to the response runs under one cleanup, so no path leaks the slot
+    stream_cleanup = StreamCleanup(cleanup)
+    try:
+        if IN_MEMORY_ANALYSIS:
+            # Registered with the digest read_upload computed, so no later step hashes the bytes again
+            upload = await read_upload(file)
+            source = file_path = register_document(upload.data, upload.sha256)
+        else:
+            await run_io(os.makedirs, "data", exist_ok=True)
+            upload = await save_upload(file, file_path)
+            source = file_path
+        if upload.size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, source)
+        if not probe.ok:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
+        
+        if not query or query.strip() == "":
+            query = "Provide a comprehensive analysis of my blood test report"
+        
+        valid_types = ["comprehensive", "nutrition", "exercise", "verification"]
+        if analysis_type not in valid_types:
+            analysis_type = "comprehensive"
+        
+        print(f"🔄 Streaming: {file.filename}")
+        print(f"📝 Query: {query}")
+        print(f"🎯 Analysis Type: {analysis_type}")
+        
+        def producer(emit):
+            analyzer.stream_blood_test(source, query, analysis_type, emit, file.filename, probe)
+        
+        media_type = stream_media_type(request.headers.get("accept", ""))
+        return CleanupStreamingResponse(
+            stream_sections(
+                producer,
+                analysis_type,
+                media_type,
+                start={"query": query, "file_processed": file.filename, "file_size": f"{upload.size} bytes"},
+                end={"disclaimer": "⚠️ This analysis is for informational purposes only. Always consult healthcare professionals for medical decisions."},
+                cleanup=stream_cleanup
+            ),
+            stream_cleanup,
+            media_type=media_type
+        )
+    except UploadTooLarge as e:
+        stream_cleanup.close()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        # Also reached when the request is cancelled because the client went away
+        stream_cleanup.close()
+        raise
+
+@app.post("/analyze/batch")
+async def analyze_blood_report_batch(
+    files: List[UploadFile] = File(...),
+    query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
+    analysis_type: str = Form(default="comprehensive")
+):
+    """
+    🩺 Analyze many blood test reports (PDFs and/or zip archives of PDFs) in one request.
+    Results stream back as NDJSON, one line per report as soon as it is analyzed.
+    """
+    
+    # Uploads and zip members are spooled to disk, within BATCH_MAX_TOTAL_BYTES
+    spool = BatchSpool()
+    rejected = []
+    
+    async def cleanup():
+        await run_io(spool.cleanup)
+    
+    batch_cleanup = StreamCleanup(cleanup)
+    try:
+        for file in files:
+            name = file.filename or "upload"
+            lower_name = name.lower()
+            if not (lower_name.endswith('.pdf') or lower_name.endswith('.zip')):
+                rejected.append({"file": name, "status": "error", "detail": "Please upload a PDF file"})
+                continue
+            
+            path = spool.new_path(".zip" if lower_name.endswith('.zip') else ".pdf")
+            try:
+                upload = await save_upload(file, path)
+            except UploadTooLarge as e:
+                rejected.append({"file": name, "status": "error", "detail": str(e)})
+                continue
+            spool.reserve(upload.size)
+            
+            if lower_name.endswith('.zip'):
+                try:
+                    await run_io(expand_zip, path, spool)
+                except (zipfile.BadZipFile, ValueError) as e:
+                    rejected.append({"file": name, "status": "error", "detail": str(e)})
+                await run_io(os.remove, path)
+            elif upload.size == 0:
+                rejected.append({"file": name, "status": "error", "detail": "File is empty"})
+            else:
+                spool.add(name, path, upload.size)
+        
+        if not query or query.strip() == "":
+            query = "Provide a comprehensive analysis of my blood test report"
+        
+        valid_types = ["comprehensive", "nutrition", "exercise", "verification"]
+        if analysis_type not in valid_types:
+            analysis_type = "comprehensive"
+        
+        print(f"📦 Batch: {len(spool.documents)} report(s), {len(rejected)} rejected")
+        print(f"🎯 Analysis Type: {analysis_type}")
+        
+        def analyze(path: str, name: str, probe):
+            return analyzer.analyze_blood_test(path, query, analysis_type, name, probe)
+        
+        return CleanupStreamingResponse(
+            ndjson_results(spool.documents, analyze, analysis_type, rejected, batch_cleanup),
+            batch_cleanup,
+            media_type="application/x-ndjson"
+        )
+    except BatchTooLarge as e:
+        batch_cleanup.close()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        batch_cleanup.close()
+        raise
+
+@app.post("/jobs", status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
+    analysis_type: str = Form(default="comprehensive")
+):
+    """
+    Queue a blood test analysis and return its job ID immediately.
+    Poll GET /jobs/{job_id} for progress and the final result.
+    """
+    
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Please upload a PDF file")
+    
+    job_id = new_job_id()
+    file_path = job_file_path(job_id)
+    
+    try:
+        # Queued uploads are kept on disk so they survive a restart
+        await run_io(os.makedirs, JOBS_DIR, exist_ok=True)
+        upload = await save_upload(file, file_path)
+        if upload.size == 0:
+            await run_io(os.remove, file_path)
+            raise HTTPException(status_code=400, detail="File is empty")
+        # Pre-flight: reject non-PDF, truncated or page-less uploads before any parsing
+        probe = await run_io(sniff_pdf, file_path)
+        if not probe.ok:
+            await run_io(os.remove, file_path)
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {probe.problem}")
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    if not query or query.strip() == "":
+        query = "Provide a comprehensive analysis of my blood test report"
+    
+    valid_types = ["comprehensive", "nutrition", "exercise", "verification"]
+    if analysis_type not in valid_types:
+        analysis_type = "comprehensive"
+    
+    await run_io(
+        job_store.create,
+        job_id,
+        analysis_type,
+        query.strip(),
+        file_path,
+        file.filename,
+        ["analysis"]
+    )
+    job_workers.notify()
+    
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Return status, per-step progress and, once finished, the analysis result"""
+    job = await run_io(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.get("/reports")
+async def list_stored_reports():
+    """Parsed reports kept in the report store, most recent first"""
+    if not report_store.enabled:
+        raise HTTPException(status_code=404, detail="Report store is disabled (set REPORT_STORE_DIR)")
+    return {"reports": await run_io(report_store.reports)}
+
+@app.post("/reports/{sha256}/analyze")
+async def reanalyze_stored_report(
+    sha256: str,
+    query: str = Form(default="Provide a comprehensive analysis of my blood test report"),
+    analysis_type: str = Form(default="comprehensive")
+):
+    """Re-run an analysis on a stored report; the PDF is not opened again"""
+    
+    if not await run_io(report_store.contains, sha256):
+        raise HTTPException(status_code=404, detail="Stored report not found")
+    
+    if not query or query.strip() == "":
+        query = "Provide a comprehensive analysis of my blood test report"
+    
+    valid_types = ["comprehensive", "nutrition", "exercise", "verification"]
+    if analysis_type not in valid_types:
+        analysis_type = "comprehensive"
+    
+    try:
+        ticket = await admission.acquire(analysis_type)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    try:
+        analysis_result = await run_analysis(analysis_type, analyzer.analyze_blood_test, store_ref(sha256), query, analysis_type)
+    finally:
+        admission.release(ticket)
+    
+    return {
+        "status": "success",
+        "message": "✅ Stored report re-analyzed successfully!",
+        "query": query,
+        "analysis_type": analysis_type,
+        "analysis": analysis_result,
+        "report": sha256
+    }
+
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting Blood Test Analyzer (FINAL WORKING VERSION)...")
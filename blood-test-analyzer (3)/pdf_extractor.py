@@ -0,0 +1,347 @@
+## Shared PDF text extraction
+import io
+import os
+import hashlib
+import threading
+import uuid
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from extraction_cache import extraction_cache
+from executors import get_pdf_process_pool, PDF_PROCESS_WORKERS
+from extraction_sandbox import ExtractionRejected, EXTRACTION_MAX_PAGES
+from extractor_backends import get_backend, DEFAULT_BACKEND
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Documents with at least this many pages are split across the PDF process pool; 0 disables
+PDF_PARALLEL_PAGES = int(os.getenv("PDF_PARALLEL_PAGES", 16))
+
+## In-memory document registry
+# Crew tools receive the report location as a string from the LLM, so uploads
+# held in memory are referenced as memory://<id> and resolved here.
+MEMORY_PREFIX = "memory://"
+_memory_documents = {}
+_memory_lock = threading.Lock()
+
+
+def register_document(data: bytes, sha256: str = None) -> str:
+    """Keep an uploaded PDF in memory and return a reference usable as a tool path
+
+    Pass the digest computed during upload to avoid hashing the bytes again.
+    """
+    ref = f"{MEMORY_PREFIX}{uuid.uuid4().hex}"
+    data = bytes(data)
+    with _memory_lock:
+        _memory_documents[ref] = (data, sha256 or hashlib.sha256(data).hexdigest())
+    return ref
+
+
+def retain_document(source) -> str:
+    """memory:// reference to source that stays valid after the caller releases or deletes it
+
+    An in-memory document is registered again with its bytes and digest, so
+    nothing is copied or hashed; any other source is read into memory.
+    Release the reference with release_document().
+    """
+    if is_memory_ref(source):
+        return register_document(*_memory_entry(source))
+    return register_document(_worker_payload(source))
+
+
+def release_document(ref: str):
+    """Drop an in-memory document once the request is finished"""
+    with _memory_lock:
+        _memory_documents.pop(ref, None)
+
+
+def is_memory_ref(source) -> bool:
+    return isinstance(source, str) and source.startswith(MEMORY_PREFIX)
+
+
+def _memory_entry(ref: str) -> tuple:
+    with _memory_lock:
+        entry = _memory_documents.get(ref)
+    if entry is None:
+        raise FileNotFoundError(f"No in-memory document registered for {ref}")
+    return entry
+
+
+def _memory_bytes(ref: str) -> bytes:
+    return _memory_entry(ref)[0]
+
+
+def document_exists(source) -> bool:
+    if isinstance(source, (str, os.PathLike)) and not is_memory_ref(source):
+        return os.path.exists(source)
+    if is_memory_ref(source):
+        with _memory_lock:
+            return source in _memory_documents
+    return source is not None
+
+
+def document_size(source) -> int:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if is_memory_ref(source):
+        return len(_memory_bytes(source))
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def document_digest(source) -> str:
+    """SHA-256 of the PDF bytes, used as the extraction cache key"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    if is_memory_ref(source):
+        return _memory_entry(source)[1]
+
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def extraction_key(source, digest: str = None) -> str:
+    """Extraction cache key: the content digest, qualified by the backend unless it is the default
+
+    Pass digest when the source's SHA-256 is already known to skip hashing it again.
+    """
+    digest = digest or document_digest(source)
+    backend = get_backend().name
+    return digest if backend == DEFAULT_BACKEND else f"{digest}:{backend}"
+
+
+def _open_checked(payload):
+    """Backend document for a path or bytes, rejecting documents over the page budget"""
+    document = get_backend().open(payload)
+    if EXTRACTION_MAX_PAGES and document.page_count > EXTRACTION_MAX_PAGES:
+        raise ExtractionRejected(
+            f"document has {document.page_count} pages, the limit is {EXTRACTION_MAX_PAGES}"
+        )
+    return document
+
+
+def _count_pages_worker(payload) -> int:
+    """Page count of a PDF, checked against the page budget; runs inside the sandbox"""
+    return _open_checked(payload).page_count
+
+
+def _parse_pages_worker(payload, start: int = 0, stop: int = None) -> list:
+    """Parse pages [start, stop) of a PDF given as a path or raw bytes; runs inside the sandbox"""
+    document = _open_checked(payload)
+    stop = document.page_count if stop is None else stop
+    return [document.page_text(index) for index in range(start, stop)]
+
+
+def page_ranges(count: int, workers: int) -> list:
+    """Split count pages into at most workers contiguous (start, stop) ranges"""
+    workers = max(1, min(workers, count))
+    size, extra = divmod(count, workers)
+    ranges = []
+    start = 0
+    for index in range(workers):
+        stop = start + size + (1 if index < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _worker_payload(source):
+    """A path or the raw bytes, whichever can be shipped to a worker process"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if is_memory_ref(source):
+        return _memory_bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    source.seek(0)
+    payload = source.read()
+    source.seek(0)
+    return payload
+
+
+def _parse_pages(source, parallel_pages: int = PDF_PARALLEL_PAGES) -> list:
+    pool = get_pdf_process_pool()
+    if pool is None:
+        return _parse_pages_worker(_worker_payload(source))
+
+    payload = _worker_payload(source)
+    # Every sandbox call for this document shares one wall-clock budget
+    deadline = pool.deadline()
+    if parallel_pages > 0 and PDF_PROCESS_WORKERS > 1:
+        # The untrusted xref and page tree are only ever walked inside the sandbox
+        count = pool.run(_count_pages_worker, payload, deadline=deadline)
+        if count >= parallel_pages:
+            # Each worker opens the PDF once and parses one contiguous page range
+            futures = [
+                pool.submit(_parse_pages_worker, payload, start, stop, deadline=deadline)
+                for start, stop in page_ranges(count, PDF_PROCESS_WORKERS)
+            ]
+            return [text for future in futures for text in future.result()]
+
+    return pool.run(_parse_pages_worker, payload, deadline=deadline)
+
+
+def extract_pages(source, use_cache: bool = True, key: str = None) -> list:
+    """Extract the text of every page, in order
+
+    Results are cached by content hash, so repeated uploads of the same
+    report skip pypdf entirely. key is the source's extraction_key() when
+    the caller already has it.
+    """
+    if not use_cache:
+        return _parse_pages(source)
+
+    key = key or extraction_key(source)
+    entry = extraction_cache.get(key)
+    if entry is None or not entry.get("complete", True):
+        pages = _parse_pages(source)
+        entry = {"pages": pages, "page_count": len(pages), "complete": True}
+        extraction_cache.put(key, entry)
+    return entry["pages"]
+
+
+def page_count(source, use_cache: bool = True, key: str = None) -> int:
+    """Number of pages, read from the document catalog without parsing page content
+
+    key is the source's extraction_key() when the caller already has it. A
+    document missing from the cache is counted in the extraction sandbox.
+    """
+    if use_cache:
+        entry = extraction_cache.get(key or extraction_key(source))
+        if entry is not None:
+            return entry["page_count"]
+    pool = get_pdf_process_pool()
+    if pool is None:
+        return _count_pages_worker(_worker_payload(source))
+    return pool.run(_count_pages_worker, _worker_payload(source))
+
+
+class _TextBudget:
+    """Tracks whether enough leading text has been read for a collect_text() call"""
+
+    def __init__(self, max_chars: int = None, sections: list = None):
+        self.max_chars = max_chars
+        self.sections = bool(sections)
+        self.missing = {section.lower() for section in sections or []}
+        self.length = 0
+
+    @property
+    def bounded(self) -> bool:
+        return self.max_chars is not None or self.sections
+
+    def add(self, text: str) -> bool:
+        """Account for one page; True once the need is met"""
+        self.length += len(text) + 1
+        if self.missing:
+            lowered = text.lower()
+            self.missing = {section for section in self.missing if section not in lowered}
+        return self.bounded and not self.missing and (self.max_chars is None or self.length >= self.max_chars)
+
+
+def _read_pages_worker(payload, start: int, budget: _TextBudget) -> tuple:
+    """Parse pages from start until budget is met; returns (page_count, new_pages)"""
+    document = _open_checked(payload)
+    count = document.page_count
+    pages = []
+    for index in range(start, count):
+        text = document.page_text(index)
+        pages.append(text)
+        if budget.add(text):
+            break
+    return count, pages
+
+
+def collect_text(source, max_chars: int = None, sections: list = None, use_cache: bool = True,
+                 key: str = None) -> str:
+    """Text of the leading pages, stopping as soon as the consumer's need is met
+
+    max_chars is a character budget (the result is cut to it); sections lists
+    headings, matched case-insensitively, that must all have been read. With
+    neither, every page is read. key is the source's extraction_key() when the
+    caller already has it. Pages missing from the cache are parsed in the
+    extraction sandbox.
+    """
+    budget = _TextBudget(max_chars, sections)
+    key = (key or extraction_key(source)) if use_cache else None
+    entry = extraction_cache.get(key) if use_cache else None
+    pages = list(entry["pages"]) if entry is not None else []
+
+    read = 0
+    done = False
+    for text in pages:
+        read += 1
+        if budget.add(text):
+            done = True
+            break
+
+    if not done and (entry is None or not entry.get("complete", True)):
+        pool = get_pdf_process_pool()
+        if pool is None:
+            count, more = _read_pages_worker(_worker_payload(source), len(pages), budget)
+        else:
+            count, more = pool.run(_read_pages_worker, _worker_payload(source), len(pages), budget)
+        pages.extend(more)
+        read = len(pages)
+        if use_cache and more:
+            extraction_cache.put(key, {"pages": pages, "page_count": count, "complete": len(pages) == count})
+
+    text = "".join(f"{page}\n" for page in pages[:read])
+    return text[:max_chars] if max_chars is not None and not sections else text
+
+
+def get_file_info(source) -> dict:
+    """Extract basic file information used by MedicalAnalyzer"""
+    try:
+        if not document_exists(source):
+            return {
+                "size": 0,
+                "content": "File processed",
+                "pages": 1,
+                "extracted": False
+            }
+
+        file_size = document_size(source)
+
+        # Try to extract PDF text, stopping once the first 1000 chars are read
+        try:
+            # Hash the document once for both cache lookups
+            key = extraction_key(source)
+            text_content = collect_text(source, max_chars=1000, key=key)
+
+            return {
+                "size": file_size,
+                "content": text_content,
+                "pages": page_count(source, key=key),
+                "extracted": True
+            }
+        except ExtractionRejected:
+            raise
+        except Exception:
+            return {
+                "size": file_size,
+                "content": "Blood test data processed successfully",
+                "pages": 1,
+                "extracted": False
+            }
+    except ExtractionRejected:
+        raise
+    except Exception:
+        return {
+            "size": 0,
+            "content": "Blood test report ready for analysis",
+            "pages": 1,
+            "extracted": False
+        }
@@ -0,0 +1,157 @@
+## Cheap PDF pre-flight: inspect the head and tail of an upload before parsing it
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from pdf_extractor import is_memory_ref, _memory_bytes
+
+# Bytes read from each end of the file
+SNIFF_WINDOW = 64 * 1024
+
+_HEADER = re.compile(rb"%PDF-(\d\.\d)")
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+_XREF_AT_OFFSET = re.compile(rb"\s*(?:xref\b|\d+\s+\d+\s+obj\b)")
+_PAGES_COUNT = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b")
+_LINEARIZED_PAGES = re.compile(rb"/Linearized\b[^>]*?/N\s+(\d+)")
+
+
+@dataclass
+class PdfProbe:
+    """What the head and tail of a file say about it; problem is None when it looks usable
+
+    xref is "table", "stream" or "damaged" (startxref missing or pointing elsewhere).
+    encrypted documents are left to the full parse, which opens those with
+    only an owner password using the empty user password.
+    """
+    size: int
+    version: Optional[str] = None
+    page_count: Optional[int] = None
+    encrypted: bool = False
+    xref: Optional[str] = None
+    has_text_layer: Optional[bool] = None
+    problem: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.problem is None
+
+    def file_info(self) -> dict:
+        """file_info dict for MedicalAnalyzer built without parsing the document"""
+        return {
+            "size": self.size,
+            "content": "",
+            "pages": self.page_count or 1,
+            "extracted": bool(self.has_text_layer),
+        }
+
+
+def _last_startxref(tail: bytes) -> Optional[int]:
+    """Offset from the last startxref; incremental updates append newer ones"""
+    offset = None
+    for match in _STARTXREF.finditer(tail):
+        offset = int(match.group(1))
+    return offset
+
+
+def _read_windows(source, window: int) -> tuple:
+    """Return (size, head, tail, read_at) without loading the whole file"""
+    if is_memory_ref(source):
+        source = _memory_bytes(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        return len(data), data[:window], data[-window:], lambda offset, length: data[offset:offset + length]
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return _read_stream_windows(f, window)
+    return _read_stream_windows(source, window)
+
+
+def _read_stream_windows(stream, window: int) -> tuple:
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(0)
+    head = stream.read(window)
+    stream.seek(max(0, size - window))
+    tail = stream.read(window)
+    stream.seek(0)
+    # Everything needed at an arbitrary offset is read now, while the file is open
+    cache = {}
+
+    def read_at(offset: int, length: int) -> bytes:
+        if offset not in cache:
+            stream.seek(offset)
+            cache[offset] = stream.read(length)
+            stream.seek(0)
+        return cache[offset]
+
+    startxref = _last_startxref(tail)
+    if startxref is not None and startxref < size:
+        read_at(startxref, 32)
+    return size, head, tail, read_at
+
+
+def sniff_pdf(source, window: int = SNIFF_WINDOW) -> PdfProbe:
+    """Check magic bytes, trailer, xref, encryption, page count and text layer
+
+    Only the first and last window bytes (plus a few bytes at the xref offset)
+    are read. Page count and text layer are None when the windows do not say.
+    """
+    size, head, tail, read_at = _read_windows(source, window)
+    probe = PdfProbe(size=size)
+
+    header = _HEADER.search(head[:1024])
+    if header is None:
+        probe.problem = "missing %PDF- header"
+        return probe
+    probe.version = header.group(1).decode()
+
+    # Writers may pad past %%EOF, so the marker can sit anywhere in the tail window
+    if b"%%EOF" not in tail:
+        probe.problem = "file is truncated (no %%EOF marker)"
+        return probe
+
+    # pypdf can rebuild a damaged cross-reference, so a bad offset is noted, not rejected
+    startxref = _last_startxref(tail)
+    at_offset = read_at(startxref, 32) if startxref is not None and startxref < size else b""
+    if not _XREF_AT_OFFSET.match(at_offset):
+        probe.xref = "damaged"
+    else:
+        probe.xref = "table" if at_offset.lstrip().startswith(b"xref") else "stream"
+
+    if b"/Encrypt" in tail or b"/Encrypt" in head:
+        probe.encrypted = True
+
+    counts = [int(a or b) for a, b in _PAGES_COUNT.findall(head + tail)]
+    linearized = _LINEARIZED_PAGES.search(head[:4096])
+    if linearized is not None:
+        probe.page_count = int(linearized.group(1))
+    elif counts:
+        # The root page tree carries the largest /Count
+        probe.page_count = max(counts)
+    if probe.page_count == 0:
+        probe.problem = "document has no pages"
+        return probe
+
+    if b"/Font" in head or b"/Font" in tail:
+        probe.has_text_layer = True
+    elif b"/Image" in head or b"/Image" in tail:
+        probe.has_text_layer = False
+    return probe
+
+
+def preflight_file_info(source, probe: PdfProbe = None) -> Optional[dict]:
+    """file_info for verification straight from the probe, or None if the probe can't answer
+
+    Pass the probe when the upload has already been sniffed, so it is not read again.
+    """
+    if probe is None:
+        try:
+            probe = sniff_pdf(source)
+        except Exception:
+            return None
+    # Whether an encrypted document opens without a password is only known after parsing it
+    if not probe.ok or probe.encrypted or probe.page_count is None or probe.has_text_layer is None:
+        return None
+    return probe.file_info()
@@ -0,0 +1,347 @@
+## Persistent store of parsed reports, reopened with mmap instead of re-parsing the PDF
+import os
+import json
+import mmap
+import time
+import struct
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from biomarker_table import ANALYTES, UNITS, PATIENTS, BiomarkerTable, document_biomarkers
+from extractor_backends import get_backend
+from executors import io_pool
+from pdf_extractor import (
+    document_digest, document_size, extract_pages, extraction_key, is_memory_ref, retain_document, release_document,
+)
+from text_normalizer import normalize_text
+
+# Directory for parsed report files and their index; empty disables the store
+REPORT_STORE_DIR = os.getenv("REPORT_STORE_DIR", "")
+# Reopened reports kept mapped in memory
+REPORT_STORE_OPEN_LIMIT = int(os.getenv("REPORT_STORE_OPEN_LIMIT", 256))
+
+STORE_PREFIX = "store://"
+_MAGIC = b"BTRS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sII")
+_ALIGN = 8
+
+# Column name -> (dtype, vocabulary whose codes are stored file-local)
+_COLUMNS = {
+    "report": (np.int32, None),
+    "patient": (np.int32, PATIENTS),
+    "analyte": (np.int32, ANALYTES),
+    "unit": (np.int32, UNITS),
+    "value": (np.float64, None),
+    "low": (np.float64, None),
+    "high": (np.float64, None),
+    "flags": (np.uint8, None),
+}
+
+
+def is_store_ref(source) -> bool:
+    return isinstance(source, str) and source.startswith(STORE_PREFIX)
+
+
+def store_ref(digest: str) -> str:
+    return f"{STORE_PREFIX}{digest}"
+
+
+def _pad(length: int) -> int:
+    return -length % _ALIGN
+
+
+class StoredReport:
+    """A parsed report mapped from disk
+
+    Page texts are decoded on first use; biomarker value, bound and flag
+    columns are read-only NumPy views straight over the mapping.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_length = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a version {_VERSION} report store file")
+        start = _HEADER.size
+        self.meta = json.loads(self._map[start:start + meta_length])
+        self._base = start + meta_length + _pad(start + meta_length)
+        self._pages = None
+
+    @property
+    def sha256(self) -> str:
+        return self.meta["sha256"]
+
+    @property
+    def page_count(self) -> int:
+        return self.meta["page_count"]
+
+    def _text(self, span: list) -> str:
+        offset, length = span
+        return self._map[self._base + offset:self._base + offset + length].decode("utf-8")
+
+    @property
+    def pages(self) -> list:
+        if self._pages is None:
+            self._pages = [self._text(span) for span in self.meta["pages"]]
+        return self._pages
+
+    @property
+    def normalized_text(self) -> str:
+        return self._text(self.meta["normalized"])
+
+    def biomarkers(self) -> BiomarkerTable:
+        columns = []
+        for name, (dtype, vocabulary) in _COLUMNS.items():
+            offset, count = self.meta["columns"][name]
+            column = np.frombuffer(self._map, dtype=dtype, count=count, offset=self._base + offset)
+            if vocabulary is not None:
+                # File-local codes -> this process's vocabulary codes
+                names = self.meta["vocabulary"][name]
+                column = vocabulary.codes(names)[column] if names else column.copy()
+            columns.append(column)
+        return BiomarkerTable(*columns, report_ids=self.meta["report_ids"])
+
+    def file_info(self) -> dict:
+        """file_info dict for MedicalAnalyzer, as get_file_info() would build it"""
+        return {
+            "size": self.meta["size"],
+            "content": "".join(f"{page}\n" for page in self.pages)[:1000],
+            "pages": self.page_count,
+            "extracted": True,
+        }
+
+
+def _write_report(path: str, meta: dict, pages: list, normalized: str, table: BiomarkerTable):
+    """Write header, JSON metadata and 8-byte aligned text and column blocks"""
+    blocks = []
+    offset = 0
+
+    def add(data: bytes) -> list:
+        nonlocal offset
+        span = [offset, len(data)]
+        blocks.append(data + b"\0" * _pad(len(data)))
+        offset += len(data) + _pad(len(data))
+        return span
+
+    meta["pages"] = [add(page.encode("utf-8")) for page in pages]
+    meta["normalized"] = add(normalized.encode("utf-8"))
+    meta["columns"] = {}
+    meta["vocabulary"] = {}
+    for name, (dtype, vocabulary) in _COLUMNS.items():
+        column = getattr(table, name)
+        if vocabulary is not None:
+            codes, column = np.unique(column, return_inverse=True)
+            meta["vocabulary"][name] = [vocabulary.names[code] for code in codes]
+        column = np.ascontiguousarray(column, dtype=dtype)
+        meta["columns"][name] = [add(column.tobytes())[0], len(column)]
+
+    encoded = json.dumps(meta).encode("utf-8")
+    header = _HEADER.pack(_MAGIC, _VERSION, len(encoded))
+    # A temp file of its own, so a concurrent write of the same report never shares it
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(encoded)
+            f.write(b"\0" * _pad(len(header) + len(encoded)))
+            for block in blocks:
+                f.write(block)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ReportStore:
+    """Parsed reports on disk, one mapped file per report plus a SQLite hash index
+
+    Like the extraction cache, a stored report only counts for the extraction
+    backend that produced it: after a PDF_EXTRACTOR change, reports stored by
+    another backend are missing until they are stored again.
+    """
+
+    def __init__(self, directory: str = REPORT_STORE_DIR, open_limit: int = REPORT_STORE_OPEN_LIMIT):
+        self.directory = directory
+        self.open_limit = open_limit
+        # Least recently used first
+        self._open = OrderedDict()
+        # Digests being persisted right now, so concurrent requests write each report once
+        self._persisting = set()
+        self._lock = threading.Lock()
+        self._db = None
+        self.reopens = 0
+        self.writes = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS reports (
+                    sha256 TEXT PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    source_name TEXT NOT NULL,
+                    page_count INTEGER NOT NULL,
+                    biomarkers INTEGER NOT NULL,
+                    backend TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )"""
+            )
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def contains(self, digest: str) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM reports WHERE sha256 = ? AND backend = ?", (digest, get_backend().name)
+            ).fetchone() is not None
+
+    def save(self, digest: str, pages: list, table: BiomarkerTable, size: int, source_name: str = ""):
+        """Write a parsed report and index it under its content digest"""
+        backend = get_backend().name
+        file_name = f"{digest}.rpt"
+        meta = {
+            "sha256": digest,
+            "size": size,
+            "page_count": len(pages),
+            "backend": backend,
+            "report_ids": table.report_ids,
+        }
+        _write_report(os.path.join(self.directory, file_name), meta, pages,
+                      normalize_text("\n".join(pages)), table)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, file_name, source_name, len(pages), len(table), backend, time.time()),
+            )
+            self._db.commit()
+            self._open.pop(digest, None)
+            self.writes += 1
+
+    def persist(self, source, pages: list = None, source_name: str = "") -> Optional[str]:
+        """Store a report once, reusing pages already extracted for this request; returns its digest
+
+        Best effort: the store is optional, so a failed write is logged and
+        None returned instead of failing the analysis. None is also returned
+        while another request is already storing the same report.
+        """
+        if not self.enabled or is_store_ref(source):
+            return None
+        try:
+            digest = document_digest(source)
+            if self.contains(digest):
+                return digest
+            with self._lock:
+                if digest in self._persisting:
+                    return None
+                self._persisting.add(digest)
+            try:
+                if pages is None:
+                    pages = extract_pages(source, key=extraction_key(source, digest))
+                if not source_name and isinstance(source, (str, os.PathLike)) and not is_memory_ref(source):
+                    source_name = os.path.basename(source)
+                self.save(digest, pages, document_biomarkers(source, pages, digest), document_size(source), source_name)
+            finally:
+                with self._lock:
+                    self._persisting.discard(digest)
+            return digest
+        except Exception as e:
+            print(f"⚠️ Report store: could not store report: {str(e)}")
+            return None
+
+    def persist_later(self, source, pages: list = None, source_name: str = ""):
+        """Queue persist() on the I/O pool, so the request never waits for a full extraction
+
+        The report is retained in memory first: callers release or delete
+        their upload as soon as the response is built.
+        """
+        if not self.enabled or is_store_ref(source):
+            return
+        if not source_name and isinstance(source, (str, os.PathLike)) and not is_memory_ref(source):
+            source_name = os.path.basename(source)
+        try:
+            retained = retain_document(source)
+        except Exception as e:
+            print(f"⚠️ Report store: could not store report: {str(e)}")
+            return
+
+        def persist_retained():
+            try:
+                self.persist(retained, pages, source_name)
+            finally:
+                release_document(retained)
+
+        io_pool.submit(persist_retained)
+
+    def open(self, digest: str) -> StoredReport:
+        """Mapped report for a digest; raises FileNotFoundError when it was never stored"""
+        backend = get_backend().name
+        with self._lock:
+            report = self._open.get(digest)
+            if report is not None:
+                self._open.move_to_end(digest)
+                return report
+            row = self._db.execute(
+                "SELECT file FROM reports WHERE sha256 = ? AND backend = ?", (digest, backend)
+            ).fetchone() if self._db else None
+        if row is None:
+            raise FileNotFoundError(f"No stored report for {digest}")
+
+        report = StoredReport(os.path.join(self.directory, row[0]))
+        if report.meta.get("backend") != backend:
+            raise FileNotFoundError(f"Stored report {digest} was extracted with another backend")
+        with self._lock:
+            if digest not in self._open and len(self._open) >= self.open_limit:
+                # Views handed out earlier keep their own reference to the mapping
+                self._open.popitem(last=False)
+            self._open[digest] = report
+            self.reopens += 1
+        return report
+
+    def resolve(self, ref: str) -> StoredReport:
+        return self.open(ref[len(STORE_PREFIX):])
+
+    def reports(self) -> list:
+        """Index rows, most recent first"""
+        if not self.enabled:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sha256, source_name, page_count, biomarkers, backend, stored_at FROM reports ORDER BY stored_at DESC"
+            ).fetchall()
+        columns = ("sha256", "source_name", "page_count", "biomarkers", "backend", "stored_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+            return {
+                "enabled": True,
+                "reports": count,
+                "open": len(self._open),
+                "reopens": self.reopens,
+                "writes": self.writes,
+            }
+
+
+# Shared store used by MedicalAnalyzer and the report tools
+report_store = ReportStore()
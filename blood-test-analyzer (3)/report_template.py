@@ -0,0 +1,37 @@
+## Precompiled report templates: static text split once, slots filled in one string build
+from string import Formatter
+
+
+class ReportTemplate:
+    """Report text with {name} slots, parsed and compiled once at construction
+
+    Uses str.format field syntax ({{ and }} for literal braces) but only plain
+    names: no attribute access, conversions or format specs. The template is
+    compiled into a function whose body is a single f-string, so CPython renders
+    it with one BUILD_STRING over the constant static segments; call
+    render(**slots) with exactly the template's slot names.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.segments = []
+        self.slot_names = set()
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if literal:
+                self.segments.append(literal)
+            if field is None:
+                continue
+            if not field.isidentifier() or spec or conversion:
+                raise ValueError(f"Template slots must be plain names, got {{{field}}}")
+            self.slot_names.add(field)
+
+        # Slot names are validated identifiers and the text is embedded via repr(),
+        # so the generated code is exactly one f-string literal
+        params = ", ".join(sorted(self.slot_names))
+        code = f"lambda *, {params}: f{source!r}" if params else f"lambda: {source!r}"
+        self.render = eval(compile(code, "<report template>", "eval"), {})
+
+    @property
+    def static_ratio(self) -> float:
+        """Share of the template that is static text"""
+        return sum(len(segment) for segment in self.segments) / max(1, len(self.source))
@@ -0,0 +1,197 @@
+## Cache of finished analyses (or their report inputs) keyed by report content, query, analysis type and engine version
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Seconds a cached analysis stays valid; 0 disables the response cache
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 3600))
+# Analyses kept in memory before the least recently used is evicted
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+# Optional SQLite file so cached analyses survive restarts
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")
+# Bump to invalidate every cached analysis without changing code
+RESPONSE_CACHE_VERSION = os.getenv("RESPONSE_CACHE_VERSION", "1")
+
+
+def prompt_version(*texts) -> str:
+    """Short hash of everything that shapes an analysis (templates, prompts, models)"""
+    digest = hashlib.sha256(RESPONSE_CACHE_VERSION.encode("utf-8"))
+    for text in texts:
+        digest.update(b"\0")
+        digest.update(str(text).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def crew_prompt_version(tasks_by_type: dict) -> str:
+    """prompt_version() over every task's prompts and its agent's role, goal, backstory and model"""
+    texts = []
+    for analysis_type, tasks in sorted(tasks_by_type.items()):
+        for task in tasks:
+            agent = task.agent
+            texts += [
+                analysis_type, task.description, task.expected_output,
+                agent.role, agent.goal, agent.backstory, getattr(getattr(agent, "llm", None), "model", ""),
+            ]
+    return prompt_version(*texts)
+
+
+def response_key(report_sha256: str, query: str, analysis_type: str, engine_version: str,
+                 variant: str = "") -> str:
+    """Cache key for a finished answer; the query is matched exactly (after strip) since answers echo it
+
+    variant separates other renderings of the same analysis (e.g. structured output).
+    """
+    parts = [report_sha256, query.strip(), analysis_type, engine_version]
+    if variant:
+        parts.append(variant)
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def inputs_key(report_sha256: str, analysis_type: str, engine_version: str, variant: str = "") -> str:
+    """Cache key for analysis inputs read from a report, which do not depend on the query"""
+    parts = ["inputs", report_sha256, analysis_type, engine_version]
+    if variant:
+        parts.append(variant)
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def etag(key: str) -> str:
+    """Weak validator: reports carry a per-request date, so equal ETags mean equivalent, not identical, bodies"""
+    return f'W/"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    """True when an If-None-Match header names this response (or is *)"""
+    if not if_none_match:
+        return False
+    current = etag(key)[2:]
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in (current, "*"):
+            return True
+    return False
+
+
+class ResponseCache:
+    """LRU cache of analysis results with a TTL
+
+    The memory tier holds at most max_entries results; expired entries are
+    dropped on lookup. When db_path is set, results are also written to
+    SQLite (zlib-compressed) and promoted back into memory on a hit.
+    """
+
+    def __init__(self, ttl: int = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 db_path: str = RESPONSE_CACHE_DB):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+        if db_path and self.enabled:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires REAL NOT NULL, data BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires, data FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[0] > now:
+                    value = zlib.decompress(row[1]).decode("utf-8")
+                    self._remember(key, row[0], value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        if not self.enabled:
+            return
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, expires, data) VALUES (?, ?, ?)",
+                    (key, expires, zlib.compress(value.encode("utf-8"))),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, expires: float, value: str):
+        """Insert into the memory tier and evict down to max_entries (lock held)"""
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "persistent": self._db is not None,
+            }
+
+
+# Shared cache in front of MedicalAnalyzer and the crews
+response_cache = ResponseCache()
@@ -0,0 +1,345 @@
+## Accept-Encoding negotiation and response compression, with precompressed static report fragments
+import os
+import gzip
+import json
+import time
+import zlib
+import struct
+import threading
+import importlib.util
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+# Encodings offered, in server preference order; br and zstd need brotli / zstandard installed
+COMPRESSION_ENCODINGS = [
+    name.strip().lower() for name in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if name.strip()
+]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+
+# Content types worth compressing; SSE and NDJSON streams pass through untouched
+_COMPRESSIBLE = ("application/json", "text/plain", "text/html")
+
+
+class Codec:
+    """One Content-Encoding
+
+    Codecs whose format allows it also splice(): join independently
+    compressed pieces (precompressed static fragments plus freshly
+    compressed dynamic text) into one valid stream.
+    """
+    name = ""
+    module = ""
+    spliceable = False
+
+    def available(self) -> bool:
+        return not self.module or importlib.util.find_spec(self.module) is not None
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def piece(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def splice(self, parts: list) -> bytes:
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    """gzip; pieces are byte-aligned raw deflate blocks with no back-references between them"""
+    name = "gzip"
+    spliceable = True
+    # Dynamic pieces up to this size go out as stored blocks: no compression CPU at all
+    stored_max = 128
+    _header = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+    # An empty final fixed-Huffman block
+    _final = b"\x03\x00"
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, COMPRESSION_GZIP_LEVEL, mtime=0)
+
+    def piece(self, data: bytes) -> bytes:
+        if len(data) <= self.stored_max:
+            return b"".join(
+                b"\x00" + struct.pack("<HH", len(chunk), len(chunk) ^ 0xFFFF) + chunk
+                for chunk in (data[start:start + 0xFFFF] for start in range(0, len(data), 0xFFFF))
+            )
+        compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def splice(self, parts: list) -> bytes:
+        crc = 0
+        size = 0
+        out = [self._header]
+        for raw, compressed in parts:
+            crc = zlib.crc32(raw, crc)
+            size += len(raw)
+            out.append(compressed if compressed is not None else self.piece(raw))
+        out.append(self._final)
+        out.append(struct.pack("<II", crc, size & 0xFFFFFFFF))
+        return b"".join(out)
+
+
+class ZstdCodec(Codec):
+    """zstd; a stream of concatenated frames is itself a valid zstd stream"""
+    name = "zstd"
+    module = "zstandard"
+    spliceable = True
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _compressor(self):
+        # ZstdCompressor instances must not be shared between threads
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            import zstandard
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL)
+        return compressor
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor().compress(data)
+
+    piece = compress
+
+    def splice(self, parts: list) -> bytes:
+        return b"".join(compressed if compressed is not None else self.piece(raw) for raw, compressed in parts)
+
+
+class BrotliCodec(Codec):
+    """Brotli; streams cannot be concatenated, so every body is compressed whole"""
+    name = "br"
+    module = "brotli"
+
+    def compress(self, data: bytes) -> bytes:
+        import brotli
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+
+
+_codecs = {codec.name: codec for codec in (ZstdCodec(), BrotliCodec(), GzipCodec())}
+# Offered codecs in preference order, skipping unknown names and missing modules
+ENABLED_CODECS = [_codecs[name] for name in COMPRESSION_ENCODINGS if name in _codecs and _codecs[name].available()]
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(encoding: str, raw_size: int, sent_size: int, cpu_seconds: float, spliced: bool):
+    with _stats_lock:
+        entry = _stats.setdefault(encoding, {
+            "responses": 0, "spliced": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0,
+        })
+        entry["responses"] += 1
+        entry["spliced"] += spliced
+        entry["bytes_in"] += raw_size
+        entry["bytes_out"] += sent_size
+        entry["cpu_seconds"] += cpu_seconds
+
+
+def compression_stats() -> dict:
+    """Per encoding: responses, bytes before and after, savings and compression CPU"""
+    with _stats_lock:
+        encodings = {}
+        for name, entry in _stats.items():
+            encodings[name] = {
+                **entry,
+                "cpu_seconds": round(entry["cpu_seconds"], 6),
+                "savings": round(1 - entry["bytes_out"] / entry["bytes_in"], 3) if entry["bytes_in"] else 0.0,
+            }
+        return {"offered": [codec.name for codec in ENABLED_CODECS], "encodings": encodings}
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[Codec]:
+    """Highest-q enabled codec the client accepts (server order breaks ties), or None for identity"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for codec in ENABLED_CODECS:
+        weight = weights.get(codec.name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = codec, weight
+    return best
+
+
+def _weak(etag: Optional[str]) -> Optional[str]:
+    """Compressed bodies differ byte-wise from the identity body, so their ETag is weak"""
+    return etag if etag is None or etag.startswith("W/") else f"W/{etag}"
+
+
+def _escape(text: str) -> bytes:
+    """text as it appears inside a JSON string; escaping is per character, so pieces concatenate"""
+    return json.dumps(text, ensure_ascii=False)[1:-1].encode("utf-8")
+
+
+class ReportFragments:
+    """A ReportTemplate's static segments, JSON-escaped once and compressed once per codec
+
+    parts() re-splits a rendered report into those segments and the dynamic
+    text between them, so a response only compresses its dynamic pieces.
+    """
+
+    def __init__(self, template):
+        self.segments = [segment for segment in template.segments if segment]
+        self._escaped = [_escape(segment) for segment in self.segments]
+        self._compressed = {}
+        self._lock = threading.Lock()
+
+    def compressed(self, codec: Codec) -> list:
+        fragments = self._compressed.get(codec.name)
+        if fragments is None:
+            with self._lock:
+                fragments = self._compressed.get(codec.name)
+                if fragments is None:
+                    fragments = self._compressed[codec.name] = [codec.piece(data) for data in self._escaped]
+        return fragments
+
+    def parts(self, text: str, codec: Codec) -> Optional[list]:
+        """(escaped bytes, precompressed bytes or None) pieces of text, or None if it is not this template's"""
+        fragments = self.compressed(codec)
+        parts = []
+        position = 0
+        for index, segment in enumerate(self.segments):
+            found = text.find(segment, position)
+            if found < 0:
+                return None
+            if found > position:
+                parts.append((_escape(text[position:found]), None))
+            parts.append((self._escaped[index], fragments[index]))
+            position = found + len(segment)
+        if position < len(text):
+            parts.append((_escape(text[position:]), None))
+        return parts
+
+
+_PLACEHOLDER = "\x00report\x00"
+
+
+def _dumps(content) -> bytes:
+    """Same encoding as starlette's JSONResponse"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _spliced_parts(content: dict, text_key: str, text: str, fragments: ReportFragments, codec: Codec) -> Optional[list]:
+    """Envelope prefix, the report's pieces and envelope suffix, or None when the report can't be split"""
+    envelope = _dumps({**content, text_key: _PLACEHOLDER})
+    marker = _dumps(_PLACEHOLDER)[1:-1]
+    if envelope.count(marker) != 1:
+        return None
+    parts = fragments.parts(text, codec)
+    if parts is None:
+        return None
+    prefix, suffix = envelope.split(marker)
+    return [(prefix, None)] + parts + [(suffix, None)]
+
+
+def compressed_json_response(content: dict, accept_encoding: Optional[str], fragments: ReportFragments = None,
+                             text_key: str = "analysis", headers: dict = None) -> Response:
+    """JSON response compressed per Accept-Encoding
+
+    With fragments, content[text_key] is spliced from the template's
+    precompressed static segments when the negotiated codec allows it;
+    otherwise the whole body is compressed.
+    """
+    headers = dict(headers or {})
+    codec = negotiate(accept_encoding)
+    if codec is None:
+        return Response(_dumps(content), media_type="application/json", headers=headers)
+
+    started = time.thread_time()
+    body = None
+    parts = None
+    text = content.get(text_key)
+    if fragments is not None and codec.spliceable and isinstance(text, str):
+        parts = _spliced_parts(content, text_key, text, fragments, codec)
+    if parts is not None:
+        raw_size = sum(len(raw) for raw, compressed in parts)
+        body = codec.splice(parts)
+    else:
+        raw = _dumps(content)
+        raw_size = len(raw)
+        if raw_size < COMPRESSION_MIN_SIZE:
+            return Response(raw, media_type="application/json", headers=headers)
+        body = codec.compress(raw)
+    _record(codec.name, raw_size, len(body), time.thread_time() - started, parts is not None)
+
+    headers["Content-Encoding"] = codec.name
+    headers["Vary"] = "Accept-Encoding"
+    if "ETag" in headers:
+        headers["ETag"] = _weak(headers["ETag"])
+    return Response(body, media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing buffered responses per Accept-Encoding
+
+    Streamed responses (more than one body message, SSE, NDJSON) and
+    responses that already carry a Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            if (message.get("more_body", False) or "content-encoding" in headers
+                    or len(body) < self.minimum_size or not content_type.startswith(_COMPRESSIBLE)):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            started = time.thread_time()
+            compressed = codec.compress(body)
+            _record(codec.name, len(body), len(compressed), time.thread_time() - started, False)
+            headers["Content-Encoding"] = codec.name
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = _weak(headers["etag"])
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Batch analysis script: upload many blood test PDFs (or zip archives) at once
+"""
+
+import argparse
+import json
+import os
+
+import requests
+
+def collect_files(paths):
+    """Expand directories into the PDFs and zip archives they contain"""
+    collected = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(('.pdf', '.zip')):
+                    collected.append(os.path.join(path, name))
+        elif os.path.exists(path):
+            collected.append(path)
+        else:
+            print(f"⚠️ Skipping missing path: {path}")
+    return collected
+
+def batch_analyze(paths, query, analysis_type, url):
+    """Upload all files in one request and print each result as it streams back"""
+    
+    file_paths = collect_files(paths)
+    if not file_paths:
+        print("Error: No PDF or zip files found")
+        return False
+    
+    handles = []
+    try:
+        files = []
+        for path in file_paths:
+            handle = open(path, 'rb')
+            handles.append(handle)
+            content_type = 'application/zip' if path.lower().endswith('.zip') else 'application/pdf'
+            files.append(('files', (os.path.basename(path), handle, content_type)))
+        data = {
+            'query': query,
+            'analysis_type': analysis_type
+        }
+        
+        print(f"Uploading {len(file_paths)} file(s)...")
+        print(f"Query: {query}")
+        print(f"Analysis Type: {analysis_type}")
+        print("-" * 50)
+        
+        response = requests.post(url, files=files, data=data, stream=True, timeout=3600)
+        
+        if response.status_code != 200:
+            print(f"❌ ERROR (Status: {response.status_code})")
+            print("Response:", response.text)
+            return False
+        
+        failed = 0
+        for line in response.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            if result.get('status') == 'done':
+                print("=" * 50)
+                print(f"Processed: {result.get('processed')}  Failed: {result.get('failed')}")
+            elif result.get('status') == 'success':
+                print(f"✅ {result.get('file')} ({result.get('file_size')})")
+                print(result.get('analysis', 'No analysis returned'))
+                print("-" * 50)
+            else:
+                failed += 1
+                print(f"❌ {result.get('file')}: {result.get('detail')}")
+                print("-" * 50)
+        return failed == 0
+    
+    except Exception as e:
+        print(f"❌ Batch failed: {e}")
+        return False
+    finally:
+        for handle in handles:
+            handle.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many blood test reports in one request")
+    parser.add_argument("paths", nargs="+", help="PDF files, zip archives or directories")
+    parser.add_argument("--query", default="Provide a comprehensive analysis of my blood test report")
+    parser.add_argument("--analysis-type", default="comprehensive",
+                        choices=["comprehensive", "nutrition", "exercise", "verification"])
+    parser.add_argument("--url", default="http://localhost:8000/analyze/batch")
+    args = parser.parse_args()
+    
+    success = batch_analyze(args.paths, args.query, args.analysis_type, args.url)
+    
+    if success:
+        print("\n🎉 Batch completed successfully!")
+    else:
+        print("\n💥 Some reports failed. Check the error messages above.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark every installed PDF extraction backend and record the pick
+
+Each backend runs in a fresh process over the corpus (the sample PDFs by
+default; run scripts/create_sample_data.py first). Throughput, peak RSS and
+parse fidelity against the values printed in the sample reports are written
+to EXTRACTOR_BENCH_FILE, which PDF_EXTRACTOR=auto reads at start-up. A
+backend that crashes or exceeds --timeout is reported and left out.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from biomarkers import parse_biomarkers
+from extractor_backends import (
+    EXTRACTOR_BENCH_FILE, available_backends, backend_names, get_backend, preferred_backend,
+)
+
+SAMPLES = ["data/comprehensive_blood_test.pdf", "data/abnormal_blood_test.pdf"]
+
+# Values drawn by scripts/create_sample_data.py
+EXPECTED = {
+    "comprehensive_blood_test.pdf": {
+        "White Blood Cells": 7.2, "Red Blood Cells": 4.5, "Hemoglobin": 13.8, "Hematocrit": 41.2,
+        "Platelets": 285, "Glucose": 92, "BUN": 18, "Creatinine": 0.9, "Sodium": 140,
+        "Potassium": 4.1, "Chloride": 102, "Total Cholesterol": 195, "HDL Cholesterol": 58,
+        "LDL Cholesterol": 115, "Triglycerides": 110, "ALT": 28, "AST": 24,
+        "Total Bilirubin": 0.8, "TSH": 2.1, "Free T4": 1.3,
+    },
+    "abnormal_blood_test.pdf": {
+        "Total Cholesterol": 245, "HDL Cholesterol": 35, "LDL Cholesterol": 165, "Triglycerides": 220,
+        "Fasting Glucose": 108, "HbA1c": 6.2, "Hemoglobin": 10.8, "Iron": 45, "Ferritin": 12,
+    },
+}
+
+def fidelity(path, text):
+    """Share of the report's known analyte values recovered from the text, or None if unknown"""
+    expected = EXPECTED.get(os.path.basename(path))
+    if not expected:
+        return None
+    found = {record.analyte: record.value for record in parse_biomarkers(text)}
+    return sum(1 for analyte, value in expected.items() if found.get(analyte) == value) / len(expected)
+
+def run_backend(name, corpus, repeat, results):
+    """Child process: extract the corpus repeat times and report timings and peak RSS"""
+    backend = get_backend(name)
+    # Import the backend's modules before timing
+    backend.open(corpus[0]).page_text(0)
+    pages = 0
+    scores = []
+    started = time.perf_counter()
+    for round_index in range(repeat):
+        for path in corpus:
+            document = backend.open(path)
+            text = "\n".join(document.page_text(index) for index in range(document.page_count))
+            pages += document.page_count
+            if round_index == 0:
+                score = fidelity(path, text)
+                if score is not None:
+                    scores.append(score)
+    elapsed = time.perf_counter() - started
+    results.put({
+        "pages_per_second": pages / elapsed if elapsed else 0.0,
+        "seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "fidelity": sum(scores) / len(scores) if scores else None,
+    })
+
+def bench(name, corpus, repeat, timeout):
+    """Result of one backend's run, or an error string if its process crashed or timed out"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_backend, args=(name, corpus, repeat, results))
+    process.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    try:
+        while result is None:
+            try:
+                result = results.get(timeout=min(1.0, max(deadline - time.monotonic(), 0.01)))
+            except queue.Empty:
+                if not process.is_alive():
+                    # The child may have exited right after its put
+                    try:
+                        result = results.get(timeout=0.1)
+                    except queue.Empty:
+                        break
+                elif time.monotonic() >= deadline:
+                    return f"timed out after {timeout:.0f}s"
+        process.join(timeout=5)
+    finally:
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    if result is None or process.exitcode != 0:
+        return f"exit code {process.exitcode}"
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends")
+    parser.add_argument("corpus", nargs="*", help="PDF files or directories (default: sample reports)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=EXTRACTOR_BENCH_FILE, help="where to record results")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per backend")
+    args = parser.parse_args()
+
+    corpus = []
+    for entry in args.corpus or SAMPLES:
+        if os.path.isdir(entry):
+            corpus.extend(os.path.join(entry, name) for name in sorted(os.listdir(entry)) if name.lower().endswith(".pdf"))
+        elif os.path.exists(entry):
+            corpus.append(entry)
+    if not corpus:
+        print("Error: No PDFs found. Run scripts/create_sample_data.py first or pass PDF paths.")
+        return
+
+    backends = [backend.name for backend in available_backends()]
+    missing = [name for name in backend_names() if name not in backends]
+    print(f"Corpus: {len(corpus)} PDFs, {args.repeat} rounds")
+    if missing:
+        print(f"Not installed: {', '.join(missing)}")
+    print(f"{'backend':<16}{'pages/s':>10}{'peak RSS (MB)':>15}{'fidelity':>10}")
+    print("-" * 51)
+
+    results = {}
+    for name in backends:
+        result = bench(name, corpus, args.repeat, args.timeout)
+        if isinstance(result, str):
+            print(f"{name:<16}failed: {result}")
+            continue
+        results[name] = result
+        score = "n/a" if result["fidelity"] is None else f"{result['fidelity']:.0%}"
+        print(f"{name:<16}{result['pages_per_second']:>10.1f}{result['peak_rss_mb']:>15.1f}{score:>10}")
+
+    selected = preferred_backend(results, len(corpus))
+    with open(args.output, "w") as f:
+        json.dump({"selected": selected, "corpus": corpus, "backends": results}, f, indent=2)
+    print(f"\nSelected backend: {selected} (written to {args.output})")
+
+if __name__ == "__main__":
+    main()
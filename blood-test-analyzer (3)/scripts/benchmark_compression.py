@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark /analyze response compression per analysis type and encoding
+
+Each MedicalAnalyzer report is wrapped in the /analyze response envelope and
+sent through compressed_json_response() twice: "whole" compresses the full
+JSON body per request, "spliced" reuses the template's precompressed static
+fragments and compresses only the dynamic text. Reports CPU per response and
+bytes on the wire; every body is decompressed and checked against the
+identity JSON.
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main_working_final import MedicalAnalyzer, REPORT_FRAGMENTS
+from response_compression import ENABLED_CODECS, compressed_json_response, _dumps
+
+QUERY = "What do my cholesterol levels mean?"
+FILE_INFO = {"size": 2295, "pages": 1, "extracted": True, "content": ""}
+
+def envelope(analysis_type, analysis):
+    """Same fields /analyze returns in main_working_final.py"""
+    return {
+        "status": "success",
+        "message": "✅ Blood test analysis completed successfully!",
+        "query": QUERY,
+        "analysis_type": analysis_type,
+        "analysis": analysis,
+        "file_processed": "blood_test_report.pdf",
+        "file_size": f"{FILE_INFO['size']} bytes",
+        "processing_info": {
+            "analyzer": "Medical AI - Self-contained",
+            "processing_time": "< 5 seconds",
+            "analysis_depth": "Comprehensive"
+        },
+        "disclaimer": "⚠️ This analysis is for informational purposes only. Always consult healthcare professionals for medical decisions."
+    }
+
+def decompress(encoding, body):
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        import brotli
+        return brotli.decompress(body)
+    import zstandard
+    return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression")
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    analyzer = MedicalAnalyzer()
+    reports = {
+        "comprehensive": analyzer._comprehensive_analysis(QUERY, FILE_INFO),
+        "nutrition": analyzer._nutrition_analysis(QUERY, FILE_INFO),
+        "exercise": analyzer._exercise_analysis(QUERY, FILE_INFO),
+        "verification": analyzer._document_verification(FILE_INFO),
+    }
+    if not ENABLED_CODECS:
+        print("Error: No compression codecs enabled (check COMPRESSION_ENCODINGS)")
+        return
+
+    print(f"{'analysis type':<15}{'encoding':<10}{'identity B':>11}{'whole B':>9}{'spliced B':>11}"
+          f"{'whole µs':>10}{'spliced µs':>12}{'CPU saved':>11}")
+    print("-" * 89)
+    for analysis_type, analysis in reports.items():
+        content = envelope(analysis_type, analysis)
+        identity = _dumps(content)
+        for codec in ENABLED_CODECS:
+            fragments = REPORT_FRAGMENTS[analysis_type] if codec.spliceable else None
+            results = {}
+            for mode, selected in (("whole", None), ("spliced", fragments)):
+                if mode == "spliced" and selected is None:
+                    continue
+                response = compressed_json_response(content, codec.name, selected)
+                assert decompress(codec.name, response.body) == identity, f"{analysis_type}/{codec.name}/{mode}"
+                seconds = min(timeit.repeat(
+                    lambda: compressed_json_response(content, codec.name, selected),
+                    number=args.number, repeat=args.repeat,
+                )) / args.number
+                results[mode] = (len(response.body), seconds * 1e6)
+            whole = results["whole"]
+            spliced = results.get("spliced")
+            if spliced is None:
+                print(f"{analysis_type:<15}{codec.name:<10}{len(identity):>11}{whole[0]:>9}{'-':>11}"
+                      f"{whole[1]:>10.1f}{'-':>12}{'-':>11}")
+                continue
+            print(f"{analysis_type:<15}{codec.name:<10}{len(identity):>11}{whole[0]:>9}{spliced[0]:>11}"
+                  f"{whole[1]:>10.1f}{spliced[1]:>12.1f}{1 - spliced[1] / whole[1]:>10.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial vs parallel PDF text extraction by page count
+
+Builds longer reports by repeating the pages of the sample PDFs
+(run scripts/create_sample_data.py first) and times both modes.
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader, PdfWriter
+
+from executors import PDF_PROCESS_WORKERS, get_pdf_process_pool, shutdown_executors
+from pdf_extractor import _parse_pages, _parse_pages_worker
+
+SAMPLES = ["data/comprehensive_blood_test.pdf", "data/abnormal_blood_test.pdf"]
+
+def build_report(sample_path, page_count):
+    """Return PDF bytes with page_count pages cycled from a sample report"""
+    sample = PdfReader(sample_path)
+    writer = PdfWriter()
+    for index in range(page_count):
+        writer.add_page(sample.pages[index % len(sample.pages)])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF extraction")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 4, 16, 40, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = [path for path in SAMPLES if os.path.exists(path)]
+    if not samples:
+        print("Error: No sample PDFs found. Run scripts/create_sample_data.py first.")
+        return
+
+    if get_pdf_process_pool() is None or PDF_PROCESS_WORKERS < 2:
+        print("Error: Parallel extraction needs PDF_PROCESS_WORKERS >= 2")
+        return
+
+    # Warm up the worker processes so start-up cost is not measured
+    _parse_pages(build_report(samples[0], PDF_PROCESS_WORKERS), parallel_pages=1)
+
+    print(f"PDF process workers: {PDF_PROCESS_WORKERS}")
+    print(f"{'sample':<32}{'pages':>7}{'serial (s)':>12}{'parallel (s)':>14}{'speedup':>9}")
+    print("-" * 74)
+    for sample in samples:
+        for pages in args.pages:
+            data = build_report(sample, pages)
+            serial = best_of(lambda: _parse_pages_worker(data), args.repeat)
+            parallel = best_of(lambda: _parse_pages(data, parallel_pages=1), args.repeat)
+            print(f"{os.path.basename(sample):<32}{pages:>7}{serial:>12.3f}{parallel:>14.3f}{serial / parallel:>8.2f}x")
+
+    shutdown_executors()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: NutritionTool + ExerciseTool keyword checks on one report
+
+"chained" is the previous per-tool `in` chains (tools_fixed.py tables).
+"regex" is one combined alternation pass over the text for every keyword.
+"shared" is KeywordMatcher.scan() for the first tool (normalizing the text
+again, as the tools do), and "cached" is the second tool's scan of the same
+text, which only hashes it.
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools_fixed import REPORT_TOPICS
+
+NUTRITION = [
+    ("glucose", "blood sugar", "diabetes"), ("cholesterol", "lipid"), ("iron", "hemoglobin", "anemia"),
+    ("vitamin", "deficiency"), ("calcium", "bone"),
+]
+EXERCISE = [
+    ("glucose", "diabetes", "blood sugar"), ("cholesterol", "heart", "cardiovascular"),
+    ("blood pressure", "hypertension"), ("bone", "calcium", "osteo"),
+]
+
+def build_text(lines):
+    """Normalized report-like text; only glucose and iron keywords appear"""
+    row = "serum glucose 95 mg/dl 70-100 normal ferritin 40 ng/ml 15-150 iron 80 ug/dl wbc 6.1 x10^3/ul"
+    return " ".join(row for _ in range(lines))
+
+def chained(text):
+    return [
+        [any(keyword in text for keyword in condition) for condition in table]
+        for table in (NUTRITION, EXERCISE)
+    ]
+
+KEYWORDS = sorted({keyword for keywords in REPORT_TOPICS.topics.values() for keyword in keywords}, key=len, reverse=True)
+COMBINED = re.compile("|".join(map(re.escape, KEYWORDS)))
+
+def combined(text):
+    return {match.group() for match in COMBINED.finditer(text)}
+
+def shared(text):
+    REPORT_TOPICS.cache_clear()
+    return REPORT_TOPICS.scan(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tool keyword matching")
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'lines':>7}{'chars':>10}{'chained (µs)':>14}{'regex (µs)':>12}{'shared (µs)':>13}{'cached (µs)':>13}")
+    print("-" * 69)
+    for lines in args.lines:
+        text = build_text(lines)
+        REPORT_TOPICS.scan(text)
+        timings = [
+            min(timeit.repeat(lambda: func(text), number=args.number, repeat=3)) / args.number * 1e6
+            for func in (chained, combined, shared, REPORT_TOPICS.scan)
+        ]
+        print(f"{lines:>7}{len(text):>10}{timings[0]:>14.1f}{timings[1]:>12.1f}{timings[2]:>13.1f}{timings[3]:>13.2f}")
+
+if __name__ == "__main__":
+    main()
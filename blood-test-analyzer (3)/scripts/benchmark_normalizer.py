@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: previous text cleanup vs the linear-time normalizer
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalizer import collapse_blank_lines, normalize_text
+
+KEYWORDS = ["glucose", "blood sugar", "cholesterol", "iron", "vitamin"]
+
+def build_text(lines, blank_run):
+    """Report-like text with runs of blank lines between result rows"""
+    row = "Glucose  95 mg/dL   70-100\tHemoglobin 14.2 g/dL  WBC 6.1 ×10³/µL"
+    return ("\n" * blank_run).join(row for _ in range(lines))
+
+def old_blank_lines(text):
+    while "\n\n" in text:
+        text = text.replace("\n\n", "\n")
+    return text
+
+def old_keywords(text):
+    processed = ' '.join(text.strip().split())
+    return [keyword for keyword in KEYWORDS if keyword in processed.lower()]
+
+def new_keywords(text):
+    processed = normalize_text(text)
+    return [keyword for keyword in KEYWORDS if keyword in processed]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text normalization")
+    parser.add_argument("--lines", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--blank-run", type=int, default=64)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'lines':>7}{'chars':>10}{'blank lines old/new (ms)':>28}{'keyword scan old/new (ms)':>29}")
+    print("-" * 74)
+    for lines in args.lines:
+        text = build_text(lines, args.blank_run)
+        timings = [
+            timeit.timeit(lambda: func(text), number=args.number) / args.number * 1000
+            for func in (old_blank_lines, collapse_blank_lines, old_keywords, new_keywords)
+        ]
+        print(f"{lines:>7}{len(text):>10}{timings[0]:>14.2f} / {timings[1]:<11.2f}"
+              f"{timings[2]:>15.2f} / {timings[3]:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+## Stream analysis sections to the client as they are produced
+import re
+import json
+import asyncio
+
+from starlette.responses import StreamingResponse
+
+from executors import run_analysis
+
+SSE_MEDIA_TYPE = "text/event-stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Cleanup tasks still running; held so they are not garbage collected mid-run
+_cleanups = set()
+
+
+class StreamCleanup:
+    """Runs a streamed response's cleanup once, after the analysis it started has finished
+
+    The stream track()s each analysis future it starts and calls close() when
+    it ends or the client goes away. A disconnect does not stop a worker thread
+    that is still reading the upload, so cleanup (removing the upload, releasing
+    the admission slot) waits for every tracked future. Later close() calls
+    are no-ops.
+    """
+
+    def __init__(self, cleanup):
+        self._cleanup = cleanup
+        self._pending = []
+        self._closed = False
+
+    def track(self, future):
+        self._pending.append(future)
+        return future
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        pending = [future for future in self._pending if not future.done()]
+        if pending:
+            asyncio.gather(*pending, return_exceptions=True).add_done_callback(lambda _: self._run())
+        else:
+            self._run()
+
+    def _run(self):
+        task = asyncio.ensure_future(self._cleanup())
+        _cleanups.add(task)
+        task.add_done_callback(_cleanups.discard)
+
+
+class CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse that closes its StreamCleanup however the response ends
+
+    Covers what the stream's own finally cannot: a client that disconnects
+    before the first chunk, so the body generator never starts.
+    """
+
+    def __init__(self, content, cleanup: StreamCleanup, **kwargs):
+        super().__init__(content, **kwargs)
+        self.cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cleanup.close()
+
+
+# Top-level report headers look like "🥗 NUTRITION RECOMMENDATIONS:"
+_SECTION_HEADER = re.compile(r"^[^\x00-\x7F•]\S*\s+[A-Z][^a-z\n]*:\s*$", re.MULTILINE)
+
+
+def split_sections(text: str) -> list:
+    """Split a rendered report into (title, text) sections on its emoji headers
+
+    Text before the first header (the report title) becomes the "overview" section.
+    """
+    sections = []
+    headers = list(_SECTION_HEADER.finditer(text))
+    start = headers[0].start() if headers else len(text)
+    if text[:start].strip():
+        sections.append(("overview", text[:start].strip()))
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(text)
+        title = header.group(0).split(None, 1)[1].strip().rstrip(":")
+        sections.append((title, text[header.start():end].strip()))
+    return sections
+
+
+def stream_media_type(accept: str) -> str:
+    """Server-Sent Events when the client asks for them, NDJSON otherwise"""
+    return SSE_MEDIA_TYPE if accept and SSE_MEDIA_TYPE in accept else NDJSON_MEDIA_TYPE
+
+
+def format_event(event: dict, media_type: str) -> str:
+    data = json.dumps(event)
+    if media_type == SSE_MEDIA_TYPE:
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+async def stream_sections(producer, analysis_type: str, media_type: str, start: dict = None,
+                          end: dict = None, cleanup=None):
+    """Run producer(emit) on the analysis pool and stream each emitted section
+
+    producer calls emit(section, content) from its worker thread whenever a
+    section (or crew task output) is ready; every call is sent to the client
+    immediately. start and end are extra fields for the first and last events.
+    cleanup, if given, is a StreamCleanup closed once the stream ends or the
+    client goes away; it runs after producer has returned.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+
+    def emit(section: str, content: str):
+        loop.call_soon_threadsafe(queue.put_nowait, (section, content))
+
+    async def produce():
+        try:
+            await run_analysis(analysis_type, producer, emit)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    worker = asyncio.ensure_future(produce())
+    if cleanup is not None:
+        cleanup.track(worker)
+    try:
+        yield format_event({"event": "start", "analysis_type": analysis_type, **(start or {})}, media_type)
+        sections = 0
+        while True:
+            item = await queue.get()
+            if item is finished:
+                break
+            section, content = item
+            sections += 1
+            yield format_event({"event": "section", "section": section, "content": str(content)}, media_type)
+
+        try:
+            await worker
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
+            yield format_event({"event": "error", "detail": f"Processing error: {str(e)}"}, media_type)
+            return
+        yield format_event({"event": "done", "sections": sections, **(end or {})}, media_type)
+    finally:
+        if cleanup is not None:
+            cleanup.close()
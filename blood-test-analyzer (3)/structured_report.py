@@ -0,0 +1,188 @@
+## Structured reports: template sections parsed once into typed fields, filled in per request
+import re
+from typing import Optional
+
+from report_template import ReportTemplate
+from streaming import split_sections
+
+# Top-level fields of a structured analysis, in response order
+STRUCTURED_FIELDS = ("document", "sections", "findings", "recommendations", "flagged_biomarkers")
+# Returned when no fields are requested; findings and recommendations repeat what sections hold
+DEFAULT_FIELDS = ("document", "sections", "flagged_biomarkers")
+# Fields built from the rendered sections
+SECTION_FIELDS = {"sections", "findings", "recommendations"}
+
+# "• Label: text" or "✅ Label: text" items are findings, "1. text" items recommendations
+_FINDING = re.compile(r"^(?:•|✅)\s*(?P<body>.+)$")
+_RECOMMENDATION = re.compile(r"^\d+\.\s+(?P<body>.+)$")
+_LABELLED = re.compile(r"^(?P<label>[^:{}]{1,60}):\s+(?P<text>.+)$")
+# Group headers start with an upper-case word: "CRITICAL MINERALS:", "WEEK 1-2: Foundation Building"
+_GROUP = re.compile(r"^[A-Z][A-Z0-9]+\b")
+
+
+def _leaf(text: str):
+    """Static text stays a str; text with {slots} becomes a ReportTemplate"""
+    return ReportTemplate(text) if "{" in text else text
+
+
+def _fill(leaf, slots: dict):
+    if isinstance(leaf, str):
+        return leaf
+    return leaf.render(**{name: slots[name] for name in leaf.slot_names})
+
+
+def section_id(title: str) -> str:
+    """"FOODS TO MINIMIZE OR ELIMINATE" -> "foods_to_minimize_or_eliminate" """
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")
+
+
+class _Section:
+    """One report section: notes plus groups of findings and recommendations"""
+
+    def __init__(self, id: str, title: str, lines: list):
+        self.id = id
+        self.title = title
+        self.notes = []
+        self.groups = []
+        self.slot_names = set()
+        group = None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            finding = _FINDING.match(line)
+            recommendation = _RECOMMENDATION.match(line)
+            if finding or recommendation:
+                if group is None:
+                    group = {"title": None, "findings": [], "recommendations": []}
+                    self.groups.append(group)
+                if finding:
+                    labelled = _LABELLED.match(finding.group("body"))
+                    label, text = labelled.group("label", "text") if labelled else (None, finding.group("body"))
+                    group["findings"].append((label, _leaf(text)))
+                else:
+                    group["recommendations"].append(_leaf(recommendation.group("body")))
+            elif _GROUP.match(line):
+                group = {"title": _leaf(line.rstrip(":")), "findings": [], "recommendations": []}
+                self.groups.append(group)
+            else:
+                self.notes.append(_leaf(line))
+
+        for leaf in self._leaves():
+            if not isinstance(leaf, str):
+                self.slot_names |= leaf.slot_names
+        # Sections without slots render to the same dict on every request
+        self.static = self._render({}) if not self.slot_names else None
+
+    def _leaves(self):
+        yield from self.notes
+        for group in self.groups:
+            if group["title"] is not None:
+                yield group["title"]
+            yield from (text for label, text in group["findings"])
+            yield from group["recommendations"]
+
+    def _render(self, slots: dict) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "notes": [_fill(note, slots) for note in self.notes],
+            "groups": [
+                {
+                    "title": None if group["title"] is None else _fill(group["title"], slots),
+                    "findings": [{"label": label, "text": _fill(text, slots)} for label, text in group["findings"]],
+                    "recommendations": [_fill(text, slots) for text in group["recommendations"]],
+                }
+                for group in self.groups
+            ],
+        }
+
+    def render(self, slots: dict) -> dict:
+        return self.static if self.static is not None else self._render(slots)
+
+
+class StructuredReport:
+    """A ReportTemplate split into typed sections at construction
+
+    Sections follow the template's emoji headers (see streaming.split_sections);
+    the text before the first header is the "overview" section. render() fills
+    only the sections it is given, so unselected sections cost nothing.
+    """
+
+    def __init__(self, template: ReportTemplate):
+        self.sections = {}
+        for title, text in split_sections(template.source):
+            first, _, body = text.partition("\n")
+            if title == "overview":
+                # The report title, without its emoji
+                id, title = "overview", first if first[0].isascii() else first.split(None, 1)[-1]
+            else:
+                id = section_id(title)
+            base, suffix = id, 2
+            while id in self.sections:
+                id = f"{base}_{suffix}"
+                suffix += 1
+            self.sections[id] = _Section(id, title, body.splitlines())
+
+    @property
+    def section_ids(self) -> list:
+        return list(self.sections)
+
+    def select(self, ids=None) -> list:
+        """Sections in report order, limited to ids when given"""
+        if not ids:
+            return list(self.sections.values())
+        unknown = [id for id in ids if id not in self.sections]
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(unknown)}. Valid sections: {', '.join(self.sections)}")
+        return [section for section in self.sections.values() if section.id in ids]
+
+    @staticmethod
+    def uses(slot_names: set, sections: list) -> bool:
+        """True when any of the sections has one of the slots"""
+        return any(section.slot_names & slot_names for section in sections)
+
+    @staticmethod
+    def render(sections: list, slots: dict) -> list:
+        return [section.render(slots) for section in sections]
+
+
+def parse_selector(value: Optional[str], valid, kind: str = "fields") -> tuple:
+    """Comma-separated names from a fields= or sections= form value; raises ValueError on unknown names"""
+    names = tuple(dict.fromkeys(name.strip() for name in (value or "").split(",") if name.strip()))
+    unknown = [name for name in names if name not in valid]
+    if unknown:
+        raise ValueError(f"Unknown {kind}: {', '.join(unknown)}. Valid {kind}: {', '.join(valid)}")
+    return names
+
+
+def findings(sections: list) -> list:
+    """Every finding of the rendered sections, tagged with its section and group"""
+    return [
+        {"section": section["id"], "group": group["title"], **finding}
+        for section in sections for group in section["groups"] for finding in group["findings"]
+    ]
+
+
+def recommendations(sections: list) -> list:
+    """Every numbered recommendation of the rendered sections, tagged with its section and group"""
+    return [
+        {"section": section["id"], "group": group["title"], "text": text}
+        for section in sections for group in section["groups"] for text in group["recommendations"]
+    ]
+
+
+def flagged_biomarkers(table) -> list:
+    """Out-of-range values from a BiomarkerTable as JSON-ready records"""
+    return [
+        {
+            "analyte": record.analyte,
+            "value": record.value,
+            "unit": record.unit,
+            "low": record.low,
+            "high": record.high,
+            "flag": record.flag,
+            "reference_range": record.reference_range(),
+        }
+        for record in table.abnormal()
+    ]
@@ -2,10 +2,11 @@
 from crewai import Task
 
 from agents import doctor, verifier, nutritionist, exercise_specialist
-from tools import search_tool, BloodTestReportTool, NutritionTool, ExerciseTool
+from tools import search_tool, blood_test_tool, verification_tool, NutritionTool, ExerciseTool
 
 ## Creating a task to help solve user's query
 help_patients = Task(
+    name="help_patients",
     description="""Analyze the user's blood test report and provide comprehensive medical insights for their query: {query}
 
     Your analysis should include:
@@ -27,12 +28,13 @@ help_patients = Task(
     Format the response in clear, easy-to-understand language suitable for patients.""",
 
     agent=doctor,
-    tools=[BloodTestReportTool()],
+    tools=[blood_test_tool],
     async_execution=False,
 )
 
 ## Creating a nutrition analysis task
 nutrition_analysis = Task(
+    name="nutrition_analysis",
     description="""Analyze the blood test report to provide evidence-based nutrition recommendations for the user's query: {query}
 
     Focus on:
@@ -52,12 +54,14 @@ nutrition_analysis = Task(
     - Timeline for reassessment""",
 
     agent=nutritionist,
-    tools=[BloodTestReportTool(), NutritionTool()],
+    tools=[blood_test_tool, NutritionTool()],
+    context=[help_patients],
     async_execution=False,
 )
 
 ## Creating an exercise planning task
 exercise_planning = Task(
+    name="exercise_planning",
     description="""Create a safe and effective exercise program based on the blood test results and user's query: {query}
 
     Consider:
@@ -76,12 +80,14 @@ exercise_planning = Task(
     - Integration with overall health management plan""",
 
     agent=exercise_specialist,
-    tools=[BloodTestReportTool(), ExerciseTool()],
+    tools=[blood_test_tool, ExerciseTool()],
+    context=[help_patients],
     async_execution=False,
 )
 
 ## Creating a verification task
 verification = Task(
+    name="verification",
     description="""Verify that the uploaded document is a legitimate blood test report and validate its structure and content.
 
     Check for:
@@ -99,6 +105,16 @@ verification = Task(
     - Recommendation for proceeding with analysis or requesting better documentation""",
 
     agent=verifier,
-    tools=[BloodTestReportTool()],
+    tools=[verification_tool],
     async_execution=False
 )
+
+
+## Tasks run for each analysis type; nutrition and exercise only depend on the
+## doctor's analysis (their context), so they can run concurrently after it
+ANALYSIS_TASKS = {
+    "verification": [verification],
+    "nutrition": [help_patients, nutrition_analysis],
+    "exercise": [help_patients, exercise_planning],
+    "comprehensive": [help_patients, nutrition_analysis, exercise_planning],
+}
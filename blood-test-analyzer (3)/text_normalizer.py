@@ -0,0 +1,42 @@
+## Linear-time normalization of extracted report text
+import re
+
+# Unit and comparison glyphs folded to the ASCII forms used in matching
+UNIT_GLYPHS = {
+    "\u00b5": "u",     # micro sign
+    "\u03bc": "u",     # greek mu
+    "\u2264": "<=",    # less-than or equal
+    "\u2265": ">=",    # greater-than or equal
+    "\u00d7": "x",     # multiplication sign
+    "\u2212": "-",     # minus sign
+    "\u2013": "-",     # en dash
+    "\u2014": "-",     # em dash
+    "\u00b2": "^2",    # superscript two
+    "\u00b3": "^3",    # superscript three
+    "\u00a0": " ",     # no-break space
+}
+_GLYPH_ITEMS = tuple(UNIT_GLYPHS.items())
+
+_BLANK_LINES = re.compile(r"\n{2,}")
+
+
+def collapse_blank_lines(text: str) -> str:
+    """Replace every run of newlines with a single newline in one pass"""
+    return _BLANK_LINES.sub("\n", text)
+
+
+def normalize_text(text: str) -> str:
+    """Shared normalized form for keyword matching
+
+    Whitespace runs become a single space and text is lowercased. Unit
+    glyphs are folded to ASCII with one str.replace per glyph actually
+    present, skipped for pure-ASCII text; that measures faster than a regex
+    or str.translate pass. Nothing is cached, so report strings are never
+    pinned in memory.
+    """
+    normalized = " ".join(text.split()).lower()
+    if not normalized.isascii():
+        for glyph, folded in _GLYPH_ITEMS:
+            if glyph in normalized:
+                normalized = normalized.replace(glyph, folded)
+    return normalized
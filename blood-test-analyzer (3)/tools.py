@@ -5,10 +5,14 @@ load_dotenv()
 
 from crewai_tools import BaseTool
 from crewai_tools import SerperDevTool
-from langchain_community.document_loaders import PyPDFLoader
 from typing import Type
 from pydantic import BaseModel, Field
 
+from extraction_context import report_exists, report_pages, report_biomarkers
+from biomarkers import REPORT_TOOL_FORMAT, format_table, parse_header, flagged_summary
+from text_normalizer import normalize_text, collapse_blank_lines
+from keyword_matcher import KeywordMatcher
+
 ## Creating search tool
 search_tool = SerperDevTool()
 
@@ -21,6 +25,8 @@ class BloodTestReportTool(BaseTool):
     name: str = "read_blood_test_report"
     description: str = "Tool to read and extract data from a blood test report PDF file"
     args_schema: Type[BaseModel] = BloodTestReportInput
+    # "table" or "text", see REPORT_TOOL_FORMAT; the verifier always reads the full text
+    report_format: str = REPORT_TOOL_FORMAT
 
     def _run(self, path: str = 'data/sample.pdf') -> str:
         """Tool to read data from a pdf file from a path
@@ -32,28 +38,43 @@ class BloodTestReportTool(BaseTool):
             str: Full Blood Test report content
         """
         try:
-            if not os.path.exists(path):
+            if not report_exists(path):
                 return f"Error: File not found at path: {path}"
             
-            loader = PyPDFLoader(file_path=path)
-            docs = loader.load()
+            # Agents get the report header and a compact biomarker table instead of pages of free text
+            if self.report_format == "table":
+                records = report_biomarkers(path)
+                if records:
+                    return format_table(records, parse_header("\n".join(report_pages(path))))
+            
+            # Parsed once per request and shared across agents; long reports
+            # are split across the PDF process pool
+            pages = report_pages(path)
 
-            full_report = ""
-            for doc in docs:
-                # Clean and format the report data
-                content = doc.page_content
-                
-                # Remove extra whitespaces and format properly
-                while "\n\n" in content:
-                    content = content.replace("\n\n", "\n")
-                    
-                full_report += content + "\n"
+            # Clean and format the report data, collapsing blank lines
+            full_report = "".join(collapse_blank_lines(content) + "\n" for content in pages)
                 
             return full_report if full_report.strip() else "No content found in the PDF file"
             
         except Exception as e:
             return f"Error reading PDF file: {str(e)}"
 
+## One report reader shared by every agent and task
+blood_test_tool = BloodTestReportTool()
+## Verification checks the lab, patient and date details, so it always reads the full text
+verification_tool = BloodTestReportTool(report_format="text")
+
+## Keyword tables for NutritionTool and ExerciseTool, matched in one shared scan per report
+REPORT_TOPICS = KeywordMatcher({
+    "blood_sugar": ("glucose", "blood sugar"),
+    "cholesterol": ("cholesterol",),
+    "iron": ("iron",),
+    "vitamins": ("vitamin",),
+    "diabetes": ("glucose", "diabetes"),
+    "heart": ("cholesterol", "heart"),
+    "blood_pressure": ("blood pressure", "hypertension"),
+}, normalize=normalize_text)
+
 ## Creating Nutrition Analysis Tool
 class NutritionAnalysisInput(BaseModel):
     """Input schema for NutritionTool."""
@@ -67,31 +88,29 @@ class NutritionTool(BaseTool):
     def _run(self, blood_report_data: str) -> str:
         """Analyze blood report data for nutrition recommendations"""
         try:
-            # Process and analyze the blood report data
-            processed_data = blood_report_data.strip()
-            
-            # Clean up the data format
-            processed_data = ' '.join(processed_data.split())
+            # Topics found in the shared normalized form (lowercased, whitespace and unit glyphs folded)
+            topics = REPORT_TOPICS.scan(blood_report_data)
             
             # Basic nutrition analysis based on common blood markers
             recommendations = []
             
-            if "glucose" in processed_data.lower() or "blood sugar" in processed_data.lower():
+            if "blood_sugar" in topics:
                 recommendations.append("Monitor carbohydrate intake and consider complex carbs over simple sugars")
             
-            if "cholesterol" in processed_data.lower():
+            if "cholesterol" in topics:
                 recommendations.append("Consider heart-healthy foods like omega-3 rich fish, nuts, and olive oil")
             
-            if "iron" in processed_data.lower():
+            if "iron" in topics:
                 recommendations.append("Include iron-rich foods like lean meats, spinach, and legumes")
             
-            if "vitamin" in processed_data.lower():
+            if "vitamins" in topics:
                 recommendations.append("Ensure adequate intake of fruits and vegetables for essential vitamins")
             
             if not recommendations:
                 recommendations.append("Maintain a balanced diet with variety of nutrients")
             
-            return "Nutrition Recommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            report = "Nutrition Recommendations:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return report + flagged_summary(blood_report_data)
             
         except Exception as e:
             return f"Error analyzing nutrition data: {str(e)}"
@@ -109,19 +128,19 @@ class ExerciseTool(BaseTool):
     def _run(self, blood_report_data: str) -> str:
         """Create exercise plan based on blood report data"""
         try:
-            processed_data = blood_report_data.lower()
+            topics = REPORT_TOPICS.scan(blood_report_data)
             
             exercise_plan = []
             
-            if "glucose" in processed_data or "diabetes" in processed_data:
+            if "diabetes" in topics:
                 exercise_plan.append("Moderate cardio exercises like walking or swimming (30 min, 5x/week)")
                 exercise_plan.append("Resistance training 2-3x per week")
             
-            if "cholesterol" in processed_data or "heart" in processed_data:
+            if "heart" in topics:
                 exercise_plan.append("Aerobic exercises like jogging, cycling, or dancing")
                 exercise_plan.append("Aim for 150 minutes of moderate-intensity exercise per week")
             
-            if "blood pressure" in processed_data or "hypertension" in processed_data:
+            if "blood_pressure" in topics:
                 exercise_plan.append("Low-impact exercises like yoga, tai chi, or gentle swimming")
                 exercise_plan.append("Avoid high-intensity exercises initially")
             
@@ -131,7 +150,8 @@ class ExerciseTool(BaseTool):
             
             exercise_plan.append("Always consult with healthcare provider before starting new exercise routine")
             
-            return "Exercise Plan Recommendations:\n" + "\n".join(f"• {plan}" for plan in exercise_plan)
+            report = "Exercise Plan Recommendations:\n" + "\n".join(f"• {plan}" for plan in exercise_plan)
+            return report + flagged_summary(blood_report_data)
             
         except Exception as e:
             return f"Error creating exercise plan: {str(e)}"
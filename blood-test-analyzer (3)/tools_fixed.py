@@ -6,6 +6,12 @@ load_dotenv()
 from pydantic import BaseModel, Field
 from typing import Type
 
+from pdf_extractor import document_exists, document_size
+from extraction_context import report_exists, report_pages, report_biomarkers
+from biomarkers import REPORT_TOOL_FORMAT, format_table, parse_header, flagged_summary
+from text_normalizer import normalize_text
+from keyword_matcher import KeywordMatcher
+
 ## Base tool class (simplified)
 class BaseTool:
     def __init__(self):
@@ -26,23 +32,24 @@ class BloodTestReportTool(BaseTool):
     name: str = "read_blood_test_report"
     description: str = "Tool to read and extract data from a blood test report PDF file"
     args_schema: Type[BaseModel] = BloodTestReportInput
+    # "table" or "text", see REPORT_TOOL_FORMAT; the verifier always reads the full text
+    report_format: str = REPORT_TOOL_FORMAT
 
     def _run(self, path: str = 'data/sample.pdf') -> str:
         """Tool to read data from a pdf file from a path"""
         try:
-            if not os.path.exists(path):
+            if not report_exists(path):
                 return f"Blood test report file processed. Ready for analysis."
             
-            # Simple PDF text extraction
+            # PDF text extraction (path or in-memory reference), shared within the request
             try:
-                from pypdf import PdfReader
-                reader = PdfReader(path)
+                # Agents get the report header and a compact biomarker table instead of pages of free text
+                if self.report_format == "table":
+                    records = report_biomarkers(path)
+                    if records:
+                        return format_table(records, parse_header("\n".join(report_pages(path))))
                 
-                full_report = ""
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        full_report += text + "\n"
+                full_report = "".join(text + "\n" for text in report_pages(path) if text)
                 
                 if full_report.strip():
                     return full_report
@@ -51,12 +58,24 @@ class BloodTestReportTool(BaseTool):
                 
             except Exception as pdf_error:
                 # Fallback: return basic info
-                file_size = os.path.getsize(path) if os.path.exists(path) else 0
+                file_size = document_size(path) if document_exists(path) else 0
                 return f"Blood test report processed successfully. File size: {file_size} bytes. Medical data extracted and ready for comprehensive analysis."
             
         except Exception as e:
             return f"Blood test report received. Ready for medical analysis."
 
+## Keyword tables for NutritionTool and ExerciseTool, matched in one shared scan per report
+REPORT_TOPICS = KeywordMatcher({
+    "blood_sugar": ("glucose", "blood sugar", "diabetes"),
+    "lipids": ("cholesterol", "lipid"),
+    "iron": ("iron", "hemoglobin", "anemia"),
+    "vitamins": ("vitamin", "deficiency"),
+    "calcium": ("calcium", "bone"),
+    "heart": ("cholesterol", "heart", "cardiovascular"),
+    "blood_pressure": ("blood pressure", "hypertension"),
+    "bone": ("bone", "calcium", "osteo"),
+}, normalize=normalize_text)
+
 ## Creating Nutrition Analysis Tool
 class NutritionAnalysisInput(BaseModel):
     """Input schema for NutritionTool."""
@@ -70,27 +89,27 @@ class NutritionTool(BaseTool):
     def _run(self, blood_report_data: str) -> str:
         """Analyze blood report data for nutrition recommendations"""
         try:
-            processed_data = blood_report_data.lower()
+            topics = REPORT_TOPICS.scan(blood_report_data)
             
             recommendations = []
             
-            if "glucose" in processed_data or "blood sugar" in processed_data or "diabetes" in processed_data:
+            if "blood_sugar" in topics:
                 recommendations.append("Focus on complex carbohydrates and limit simple sugars")
                 recommendations.append("Include fiber-rich foods like oats, beans, and vegetables")
             
-            if "cholesterol" in processed_data or "lipid" in processed_data:
+            if "lipids" in topics:
                 recommendations.append("Include omega-3 rich foods like salmon, walnuts, and flaxseeds")
                 recommendations.append("Choose lean proteins and limit saturated fats")
             
-            if "iron" in processed_data or "hemoglobin" in processed_data or "anemia" in processed_data:
+            if "iron" in topics:
                 recommendations.append("Include iron-rich foods like lean red meat, spinach, and lentils")
                 recommendations.append("Combine iron-rich foods with vitamin C sources for better absorption")
             
-            if "vitamin" in processed_data or "deficiency" in processed_data:
+            if "vitamins" in topics:
                 recommendations.append("Ensure adequate intake of fruits and vegetables for essential vitamins")
                 recommendations.append("Consider a balanced multivitamin if deficiencies are present")
             
-            if "calcium" in processed_data or "bone" in processed_data:
+            if "calcium" in topics:
                 recommendations.append("Include calcium-rich foods like dairy, leafy greens, and fortified foods")
             
             if not recommendations:
@@ -101,7 +120,8 @@ class NutritionTool(BaseTool):
                     "Stay adequately hydrated with 8-10 glasses of water daily"
                 ])
             
-            return "🥗 NUTRITION RECOMMENDATIONS:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            report = "🥗 NUTRITION RECOMMENDATIONS:\n" + "\n".join(f"• {rec}" for rec in recommendations)
+            return report + flagged_summary(blood_report_data)
             
         except Exception as e:
             return "🥗 NUTRITION RECOMMENDATIONS:\n• Maintain a balanced, nutrient-rich diet\n• Include variety of fruits and vegetables\n• Stay well hydrated"
@@ -119,32 +139,32 @@ class ExerciseTool(BaseTool):
     def _run(self, blood_report_data: str) -> str:
         """Create exercise plan based on blood report data"""
         try:
-            processed_data = blood_report_data.lower()
+            topics = REPORT_TOPICS.scan(blood_report_data)
             
             exercise_plan = []
             
-            if "glucose" in processed_data or "diabetes" in processed_data or "blood sugar" in processed_data:
+            if "blood_sugar" in topics:
                 exercise_plan.extend([
                     "Moderate cardio exercises like brisk walking (30-45 min, 5x/week)",
                     "Resistance training with light weights (2-3x per week)",
                     "Post-meal walks to help with glucose control"
                 ])
             
-            if "cholesterol" in processed_data or "heart" in processed_data or "cardiovascular" in processed_data:
+            if "heart" in topics:
                 exercise_plan.extend([
                     "Aerobic exercises like swimming, cycling, or dancing",
                     "Aim for 150 minutes of moderate-intensity exercise per week",
                     "Include activities that elevate heart rate consistently"
                 ])
             
-            if "blood pressure" in processed_data or "hypertension" in processed_data:
+            if "blood_pressure" in topics:
                 exercise_plan.extend([
                     "Low-impact exercises like yoga, tai chi, or gentle swimming",
                     "Avoid high-intensity exercises initially",
                     "Focus on stress-reducing activities"
                 ])
             
-            if "bone" in processed_data or "calcium" in processed_data or "osteo" in processed_data:
+            if "bone" in topics:
                 exercise_plan.extend([
                     "Weight-bearing exercises like walking, hiking, or light jogging",
                     "Resistance training to strengthen bones and muscles"
@@ -159,7 +179,8 @@ class ExerciseTool(BaseTool):
             
             exercise_plan.append("⚠️ Always consult with healthcare provider before starting new exercise routine")
             
-            return "🏃‍♂️ EXERCISE PLAN RECOMMENDATIONS:\n" + "\n".join(f"• {plan}" for plan in exercise_plan)
+            report = "🏃‍♂️ EXERCISE PLAN RECOMMENDATIONS:\n" + "\n".join(f"• {plan}" for plan in exercise_plan)
+            return report + flagged_summary(blood_report_data)
             
         except Exception as e:
             return "🏃‍♂️ EXERCISE PLAN RECOMMENDATIONS:\n• Start with 30 minutes of moderate exercise 3-4x per week\n• Include both cardio and strength training\n• Consult healthcare provider before starting"